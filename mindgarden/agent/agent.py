@@ -4,38 +4,98 @@ Quinn agent module for MindGarden using OpenAI Agent SDK.
 
 import logging
 import asyncio
-from typing import Dict, List, Any, Optional, Callable
+from collections import deque
+from typing import Dict, List, Any, Optional, Callable, AsyncIterator
 
-from openai import OpenAI
+import orjson
+from openai import AsyncOpenAI
 from openai_agents import AsyncAgent
 from openai_agents.tools import Tool
 from openai_agents.types import AgentState
 from openai_agents.prompts import PromptBuilder
 
 from mindgarden.config.settings import get_config
-from mindgarden.memory.memory_manager import MemoryManager
+from mindgarden.memory.memory_manager import MemoryManager, MemoryManagerProtocol
 
 logger = logging.getLogger(__name__)
 
+# Most rounds of tool calls answered while streaming a single reply
+_MAX_TOOL_ROUNDS = 5
+
+# Names, descriptions and parameter schemas of the agent's tools, shared by
+# the agent run and the streamed chat completions
+_TOOL_SPECS = {
+    "memory_search": {
+        "description": "Search for information in the memory system",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The search query",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of memories to retrieve",
+                    "default": 5,
+                },
+            },
+            "required": ["query"],
+        },
+    },
+    "entity_lookup": {
+        "description": "Look up information about an entity in the knowledge graph",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "entity_name": {
+                    "type": "string",
+                    "description": "The name of the entity to look up",
+                },
+            },
+            "required": ["entity_name"],
+        },
+    },
+}
+
 
 class Agent:
     """Quinn agent implementation using OpenAI Agent SDK."""
 
-    def __init__(self):
+    def __init__(self) -> None:
         """Initialize the Quinn agent."""
         self.config = get_config()
-        self.memory_manager = MemoryManager()
-        self.conversation_history = []
+        self.memory_manager: MemoryManagerProtocol = MemoryManager()
+        # Only the most recent messages are kept; older ones are evicted
+        self.conversation_history: deque[Dict[str, str]] = deque(maxlen=self.config.agent_history_length)
         
-        # Initialize OpenAI client with API key and optional org ID
+        # Initialize OpenAI client with API key and optional org ID. The async
+        # client keeps one HTTP connection pool for the whole session.
         openai_args = {"api_key": self.config.openai_api_key}
         if self.config.openai_org_id:
             openai_args["organization"] = self.config.openai_org_id
             
-        self.client = OpenAI(**openai_args)
+        self.client = AsyncOpenAI(**openai_args)
+        
+        # Event loop for the synchronous process_message adapter, created on
+        # first use. The client's connection pool is bound to the loop it was
+        # first used on, so every synchronous call must run on the same loop.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
         # Initialize agent state
-        self.state = {"conversation": []}
+        self.state: Dict[str, Any] = {"conversation": []}
+        
+        # The base system prompt only depends on configuration, so build it once
+        self._base_prompt = f"""
+        You are {self.config.agent_name}, a helpful, friendly, and knowledgeable assistant.
+        
+        Your goal is to provide helpful, accurate, and thoughtful responses to user queries.
+        You have access to memory storage which contains conversation history and documents.
+        You also have access to a knowledge graph with entities and their relationships.
+        
+        Use the memory_search tool when you need to find relevant information from past conversations or stored documents.
+        Use the entity_lookup tool when you need detailed information about a specific entity.
+        """
         
         # Initialize the agent
         self.async_agent = self._create_agent()
@@ -44,15 +104,21 @@ class Agent:
         """
         Process a user message and generate a response using Agent SDK.
         
+        This is a synchronous adapter for callers without an event loop. Every
+        call runs on one event loop owned by the agent, so the client's HTTP
+        connections stay usable between calls; call close() when done. Async
+        callers should await _process_message_async on their own loop instead,
+        and not mix the two on one agent.
+        
         Args:
             message: The user message to process.
             
         Returns:
             The agent's response.
         """
-        # Run the async method in a synchronous way
-        response = asyncio.run(self._process_message_async(message))
-        return response
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self._process_message_async(message))
 
     async def _process_message_async(self, message: str) -> str:
         """
@@ -64,15 +130,7 @@ class Agent:
         Returns:
             The agent's response.
         """
-        # Add user message to conversation history
-        self.conversation_history.append({"role": "user", "content": message})
-        
-        # Retrieve relevant memories
-        relevant_memories = self.memory_manager.retrieve_relevant(message)
-        
-        # Update agent state with relevant memories and new message
-        self.state["relevant_memories"] = relevant_memories
-        self.state["conversation"] = self.conversation_history[-10:]  # Last 10 messages
+        await self._prepare_turn(message)
         
         # Run the agent
         try:
@@ -83,10 +141,10 @@ class Agent:
             assistant_message = response.content[0].text
             
             # Add to conversation history
-            self.conversation_history.append({"role": "assistant", "content": assistant_message})
+            self._append_history("assistant", assistant_message)
             
             # Store conversation in memory
-            self.memory_manager.store_conversation(message, assistant_message)
+            await asyncio.to_thread(self.memory_manager.store_conversation, message, assistant_message)
             
             return assistant_message
             
@@ -94,6 +152,180 @@ class Agent:
             logger.error(f"Error running agent: {str(e)}")
             raise
 
+    async def stream_message(self, message: str) -> AsyncIterator[str]:
+        """
+        Process a user message and stream the response as it is generated.
+        
+        The reply is streamed from the chat completions API with the same system
+        prompt, memory context, conversation history and tools as the agent run.
+        When the model calls tools, they are run and their results sent back in
+        a follow-up request, whose reply is streamed in turn. Once the stream
+        ends, the full reply is added to the conversation history and stored in
+        memory.
+        
+        Args:
+            message: The user message to process.
+            
+        Yields:
+            Text deltas of the agent's response.
+        """
+        await self._prepare_turn(message)
+        
+        messages = [
+            {"role": "system", "content": self._build_system_message(self.state)},
+            *self.state["conversation"],
+        ]
+        
+        completion_params = {
+            "model": self.config.model,
+            "tools": [
+                {"type": "function", "function": {"name": name, **spec}}
+                for name, spec in _TOOL_SPECS.items()
+            ],
+            "temperature": self.config.agent_temperature,
+            "stream": True,
+        }
+        
+        # Add max_tokens if specified
+        if self.config.agent_max_tokens:
+            completion_params["max_tokens"] = self.config.agent_max_tokens
+        
+        try:
+            chunks = []
+            for _ in range(_MAX_TOOL_ROUNDS):
+                stream = await self.client.chat.completions.create(messages=messages, **completion_params)
+                
+                round_chunks = []
+                tool_calls: Dict[int, Dict[str, str]] = {}
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    
+                    if delta.content:
+                        round_chunks.append(delta.content)
+                        yield delta.content
+                        
+                    # Tool calls arrive in fragments, keyed by their index
+                    for call in delta.tool_calls or []:
+                        entry = tool_calls.setdefault(call.index, {"id": "", "name": "", "arguments": ""})
+                        entry["id"] = call.id or entry["id"]
+                        if call.function:
+                            entry["name"] += call.function.name or ""
+                            entry["arguments"] += call.function.arguments or ""
+                            
+                chunks.extend(round_chunks)
+                if not tool_calls:
+                    break
+                    
+                # Answer the tool calls and let the model continue from the results
+                calls = [tool_calls[index] for index in sorted(tool_calls)]
+                messages.append({
+                    "role": "assistant",
+                    "content": "".join(round_chunks) or None,
+                    "tool_calls": [
+                        {
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]},
+                        }
+                        for call in calls
+                    ],
+                })
+                for call in calls:
+                    result = await self._run_tool(call["name"], call["arguments"])
+                    messages.append({"role": "tool", "tool_call_id": call["id"], "content": result})
+            else:
+                logger.warning("Stopped answering tool calls after %d rounds", _MAX_TOOL_ROUNDS)
+            
+            assistant_message = "".join(chunks)
+            
+            # Add to conversation history
+            self._append_history("assistant", assistant_message)
+            
+            # Store conversation in memory
+            await asyncio.to_thread(self.memory_manager.store_conversation, message, assistant_message)
+            
+        except Exception as e:
+            logger.error(f"Error streaming agent response: {str(e)}")
+            raise
+
+    async def _run_tool(self, name: str, arguments: str) -> str:
+        """
+        Run a tool requested by the model while streaming.
+        
+        Args:
+            name: The name of the tool.
+            arguments: The tool arguments as a JSON object.
+            
+        Returns:
+            The tool result as JSON, or a JSON error for the model to read.
+        """
+        handlers = {
+            "memory_search": self._memory_search_tool,
+            "entity_lookup": self._entity_lookup_tool,
+        }
+        
+        try:
+            result = await handlers[name](**orjson.loads(arguments or "{}"))
+        except Exception as e:
+            logger.error(f"Error running tool {name}: {e}")
+            result = {"error": f"Tool {name} failed: {e}"}
+            
+        return orjson.dumps(result, default=str).decode()
+
+    async def _prepare_turn(self, message: str) -> None:
+        """
+        Record a user message and load the memories relevant to it into the state.
+        
+        Args:
+            message: The user message to process.
+        """
+        # Add user message to conversation history
+        self._append_history("user", message)
+        
+        # Retrieve relevant memories. Memory operations block on Neo4j and
+        # OpenAI, so they run in a worker thread to keep the event loop free.
+        relevant_memories = await asyncio.to_thread(self.memory_manager.retrieve_relevant, message)
+        
+        # Update agent state with relevant memories and new message
+        self.state["relevant_memories"] = relevant_memories
+        self.state["conversation"] = list(self.conversation_history)
+
+    def _append_history(self, role: str, content: str) -> None:
+        """
+        Append a message to the bounded conversation history.
+        
+        Args:
+            role: The message role ('user' or 'assistant').
+            content: The message content.
+        """
+        if len(self.conversation_history) == self.conversation_history.maxlen:
+            logger.debug("history_trimmed: dropping oldest of %d messages", self.conversation_history.maxlen)
+        self.conversation_history.append({"role": role, "content": content})
+
+    async def aclose(self) -> None:
+        """Close the OpenAI client and the memory manager, releasing their connections."""
+        await self.client.close()
+        await asyncio.to_thread(self.memory_manager.close)
+        
+    def close(self) -> None:
+        """
+        Close the OpenAI client, the memory manager, and the event loop used by process_message.
+        
+        For synchronous callers; async callers should await aclose() instead.
+        """
+        if self._loop is None:
+            # process_message never ran, so no loop owns the client yet
+            asyncio.run(self.aclose())
+            return
+            
+        try:
+            self._loop.run_until_complete(self.aclose())
+        finally:
+            self._loop.close()
+            self._loop = None
+
     def _create_agent(self) -> AsyncAgent:
         """
         Create an OpenAI Agent instance.
@@ -137,23 +369,9 @@ class Agent:
         """
         return Tool(
             name="memory_search",
-            description="Search for information in the memory system",
+            description=_TOOL_SPECS["memory_search"]["description"],
             run=self._memory_search_tool,
-            parameters={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The search query",
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Maximum number of memories to retrieve",
-                        "default": 5,
-                    },
-                },
-                "required": ["query"],
-            },
+            parameters=_TOOL_SPECS["memory_search"]["parameters"],
         )
         
     def _create_entity_tool(self) -> Tool:
@@ -165,18 +383,9 @@ class Agent:
         """
         return Tool(
             name="entity_lookup",
-            description="Look up information about an entity in the knowledge graph",
+            description=_TOOL_SPECS["entity_lookup"]["description"],
             run=self._entity_lookup_tool,
-            parameters={
-                "type": "object",
-                "properties": {
-                    "entity_name": {
-                        "type": "string",
-                        "description": "The name of the entity to look up",
-                    },
-                },
-                "required": ["entity_name"],
-            },
+            parameters=_TOOL_SPECS["entity_lookup"]["parameters"],
         )
 
     async def _memory_search_tool(self, query: str, limit: int = 5) -> Dict[str, Any]:
@@ -190,7 +399,7 @@ class Agent:
         Returns:
             A dictionary with search results.
         """
-        memories = self.memory_manager.retrieve_relevant(query, limit)
+        memories = await asyncio.to_thread(self.memory_manager.retrieve_relevant, query, limit)
         return {
             "memories": memories,
             "count": len(memories),
@@ -206,7 +415,7 @@ class Agent:
         Returns:
             A dictionary with entity information.
         """
-        entity_info = self.memory_manager.get_entity_information(entity_name)
+        entity_info = await asyncio.to_thread(self.memory_manager.get_entity_information, entity_name)
         return entity_info
 
     def _build_system_message(self, state: Dict[str, Any]) -> str:
@@ -219,23 +428,14 @@ class Agent:
         Returns:
             The formatted system message.
         """
-        base_prompt = f"""
-        You are {self.config.agent_name}, a helpful, friendly, and knowledgeable assistant.
-        
-        Your goal is to provide helpful, accurate, and thoughtful responses to user queries.
-        You have access to memory storage which contains conversation history and documents.
-        You also have access to a knowledge graph with entities and their relationships.
-        
-        Use the memory_search tool when you need to find relevant information from past conversations or stored documents.
-        Use the entity_lookup tool when you need detailed information about a specific entity.
-        """
-        
-        # Add memory context if available
-        memory_context = ""
         relevant_memories = state.get("relevant_memories", [])
-        if relevant_memories:
-            memory_context = "\n\nRelevant context from past interactions and knowledge:\n"
-            for i, memory in enumerate(relevant_memories):
-                memory_context += f"{i+1}. {memory}\n"
+        if not relevant_memories:
+            return self._base_prompt
         
-        return base_prompt + memory_context 
\ No newline at end of file
+        # Add memory context
+        return (
+            self._base_prompt
+            + "\n\nRelevant context from past interactions and knowledge:\n"
+            + "\n".join(f"{i+1}. {memory}" for i, memory in enumerate(relevant_memories))
+            + "\n"
+        )
@@ -2,16 +2,22 @@
 Main CLI interface for MindGarden.
 """
 
+import asyncio
+
 import typer
 from rich.console import Console
 from rich.prompt import Prompt
 
 from mindgarden.agent.agent import Agent
 from mindgarden.config.settings import get_config
+from mindgarden.core.logging import setup_logging
 
 app = typer.Typer(help="MindGarden CLI")
 console = Console()
 
+# Inputs that end a chat session, compared after stripping and lowercasing
+_EXIT_WORDS = frozenset({"exit", "quit", "bye"})
+
 
 def check_api_key() -> bool:
     """Check if OpenAI API key is configured."""
@@ -23,36 +29,54 @@ def check_api_key() -> bool:
     return True
 
 
+async def _print_reply(agent: Agent, message: str) -> None:
+    """Print the agent's reply to a message as it is streamed."""
+    async for delta in agent.stream_message(message):
+        console.print(delta, end="", markup=False, highlight=False)
+
+
 @app.command()
 def chat(debug: bool = typer.Option(False, "--debug", "-d", help="Enable debug mode")):
     """Start a chat session with Quinn."""
     if not check_api_key():
         return
     
+    if debug:
+        setup_logging(debug=True)
+    
     config = get_config()
     agent = Agent()
     
     console.print(f"[bold green]{config.agent_name}[/bold green]: Hello! I'm {config.agent_name}, your personal assistant. How can I help you today?")
     
-    while True:
-        try:
-            user_input = Prompt.ask("\n[bold blue]You[/bold blue]")
+    # Reuse one event loop for the whole session so the agent's HTTP
+    # connections survive between turns
+    loop = asyncio.new_event_loop()
+    
+    try:
+        while True:
+            try:
+                user_input = Prompt.ask("\n[bold blue]You[/bold blue]")
+                
+                if user_input.strip().lower() in _EXIT_WORDS:
+                    console.print(f"[bold green]{config.agent_name}[/bold green]: Goodbye! Have a great day!")
+                    break
+                
+                console.print(f"\n[bold green]{config.agent_name}[/bold green]: ", end="")
+                loop.run_until_complete(_print_reply(agent, user_input))
+                console.print()
             
-            if user_input.lower() in ["exit", "quit", "bye"]:
-                console.print(f"[bold green]{config.agent_name}[/bold green]: Goodbye! Have a great day!")
+            except KeyboardInterrupt:
+                console.print("\n[bold green]{config.agent_name}[/bold green]: Goodbye! Have a great day!")
                 break
-            
-            response = agent.process_message(user_input)
-            console.print(f"\n[bold green]{config.agent_name}[/bold green]: {response}")
-        
-        except KeyboardInterrupt:
-            console.print("\n[bold green]{config.agent_name}[/bold green]: Goodbye! Have a great day!")
-            break
-        except Exception as e:
-            if debug:
-                console.print(f"[bold red]Error:[/bold red] {str(e)}")
-            else:
-                console.print("[bold red]Error:[/bold red] Something went wrong. Please try again.")
+            except Exception as e:
+                if debug:
+                    console.print(f"[bold red]Error:[/bold red] {str(e)}")
+                else:
+                    console.print("[bold red]Error:[/bold red] Something went wrong. Please try again.")
+    finally:
+        loop.run_until_complete(agent.aclose())
+        loop.close()
 
 
 @app.command()
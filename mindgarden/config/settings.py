@@ -2,54 +2,54 @@
 Configuration settings for MindGarden.
 """
 
-import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Optional
 
-from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-
-# Load environment variables from .env file
-load_dotenv()
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # Base paths
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
 LOGS_DIR = BASE_DIR / "logs"
 
-# Ensure directories exist
-DATA_DIR.mkdir(exist_ok=True)
-LOGS_DIR.mkdir(exist_ok=True)
-
-# Environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID", None)
-NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
-NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
-
-# Agent settings
-DEFAULT_MODEL = os.getenv("MODEL", "gpt-4o")
-AGENT_NAME = os.getenv("AGENT_NAME", "Quinn")
 
-
-class AppConfig(BaseModel):
-    """Application configuration."""
+class AppConfig(BaseSettings):
+    """
+    Application configuration.
+    
+    Each field is read from the environment variable of the same name
+    (case-insensitive) or from the project's .env file, falling back to the
+    defaults below.
+    """
+    
+    model_config = SettingsConfigDict(env_file=BASE_DIR / ".env", extra="ignore")
     
     # API keys
-    openai_api_key: str = Field(default=OPENAI_API_KEY)
-    openai_org_id: Optional[str] = Field(default=OPENAI_ORG_ID)
+    openai_api_key: str = Field(default="")
+    openai_org_id: Optional[str] = Field(default=None)
     
     # Database settings
-    neo4j_uri: str = Field(default=NEO4J_URI)
-    neo4j_user: str = Field(default=NEO4J_USER)
-    neo4j_password: str = Field(default=NEO4J_PASSWORD)
+    neo4j_uri: str = Field(default="bolt://localhost:7687")
+    neo4j_user: str = Field(default="neo4j")
+    neo4j_password: str = Field(default="password")
+    neo4j_max_connection_pool_size: int = Field(default=50)
     
     # Agent settings
-    model: str = Field(default=DEFAULT_MODEL)
-    agent_name: str = Field(default=AGENT_NAME)
+    model: str = Field(default="gpt-4o")
+    agent_name: str = Field(default="Quinn")
     agent_temperature: float = Field(default=0.7)
     agent_max_tokens: Optional[int] = Field(default=None)
+    agent_history_length: int = Field(default=20)
+    
+    # Memory search settings
+    embedding_model: str = Field(default="text-embedding-3-small")
+    embedding_dim: int = Field(default=1536)
+    memory_search_threshold: float = Field(default=0.40)
+    
+    # Number of recent memories kept in process for the in-memory fallback
+    memory_cache_size: int = Field(default=10_000)
     
     # Path settings
     base_dir: Path = Field(default=BASE_DIR)
@@ -57,10 +57,14 @@ class AppConfig(BaseModel):
     logs_dir: Path = Field(default=LOGS_DIR)
 
 
-# Default configuration
-config = AppConfig()
+@lru_cache(maxsize=1)
+def get_config() -> AppConfig:
+    """Get the application configuration, loading it on first use."""
+    return AppConfig()
 
 
-def get_config() -> AppConfig:
-    """Get the application configuration."""
-    return config 
\ No newline at end of file
+def ensure_dirs() -> None:
+    """Create the data and logs directories if they do not exist yet."""
+    config = get_config()
+    config.data_dir.mkdir(parents=True, exist_ok=True)
+    config.logs_dir.mkdir(parents=True, exist_ok=True)
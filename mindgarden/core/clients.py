@@ -0,0 +1,28 @@
+"""
+Shared API clients for MindGarden.
+"""
+from typing import Optional
+
+from openai import OpenAI
+
+from mindgarden.config.settings import get_config
+
+_openai_client: Optional[OpenAI] = None
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Get the process-wide synchronous OpenAI client, creating it on first use.
+    
+    The client pools its HTTP connections, so sharing one client lets
+    embedding and entity extraction requests from every component and
+    thread reuse the same warm connections.
+    
+    Returns:
+        The shared OpenAI client.
+    """
+    global _openai_client
+    if _openai_client is None:
+        config = get_config()
+        _openai_client = OpenAI(api_key=config.openai_api_key, organization=config.openai_org_id)
+    return _openai_client
@@ -8,7 +8,7 @@ from pathlib import Path
 
 from loguru import logger
 
-from mindgarden.config.settings import get_config
+from mindgarden.config.settings import get_config, ensure_dirs
 
 
 class InterceptHandler(logging.Handler):
@@ -22,22 +22,35 @@ class InterceptHandler(logging.Handler):
         except ValueError:
             level = record.levelno
 
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
+        # Find caller from where originated the logged message. Records logged
+        # through Logger.info() and friends reach emit() six frames below the
+        # caller, so jump straight there and only walk any remaining frames of
+        # the logging module (e.g. for Logger.exception()).
+        try:
+            frame, depth = sys._getframe(6), 6
+        except ValueError:
+            frame, depth = sys._getframe(0), 0
+        while frame and frame.f_code.co_filename == logging.__file__:
             frame = frame.f_back
             depth += 1
 
         logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
 
 
-def setup_logging():
-    """Configure logging for MindGarden."""
+def setup_logging(debug: bool = False):
+    """
+    Configure logging for MindGarden.
+    
+    Args:
+        debug: Forward standard library DEBUG records as well, and show them
+            on the console. Otherwise records below INFO are dropped before
+            reaching loguru.
+    """
     config = get_config()
     logs_dir = config.logs_dir
     
-    # Create logs directory if it doesn't exist
-    logs_dir.mkdir(parents=True, exist_ok=True)
+    # Create data and logs directories if they don't exist
+    ensure_dirs()
     
     # Remove any pre-existing loguru handlers
     logger.remove()
@@ -45,7 +58,7 @@ def setup_logging():
     # Setup loguru handler for console output
     logger.add(
         sys.stderr,
-        level="INFO",
+        level="DEBUG" if debug else "INFO",
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
     )
     
@@ -59,7 +72,7 @@ def setup_logging():
     )
     
     # Intercept standard logging
-    logging.basicConfig(handlers=[InterceptHandler()], level=0)
+    logging.basicConfig(handlers=[InterceptHandler()], level=logging.DEBUG if debug else logging.INFO, force=True)
     
     # Replace standard library handlers with Loguru
     for name in logging.root.manager.loggerDict.keys():
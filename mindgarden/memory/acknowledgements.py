@@ -0,0 +1,27 @@
+"""
+Acknowledgement phrases recognized by the MindGarden memory system.
+"""
+import string
+from typing import Optional
+
+# Short replies that never name an entity and mean the same with any punctuation
+ACKNOWLEDGEMENTS = frozenset({
+    "ok", "okay", "k", "sure", "yes", "yep", "yeah", "no", "nope",
+    "thanks", "thank you", "thx", "ty", "cool", "great", "nice", "got it",
+    "hi", "hello", "hey", "bye", "goodbye",
+})
+
+
+def normalize_acknowledgement(text: str) -> Optional[str]:
+    """
+    Normalize text that is a bare acknowledgement such as "ok" or "Thanks!".
+    
+    Args:
+        text: The text to normalize.
+        
+    Returns:
+        The acknowledgement, case-folded and without surrounding punctuation,
+        or None if the text is anything else.
+    """
+    normalized = " ".join(text.casefold().split()).strip(string.punctuation + " ")
+    return normalized if normalized in ACKNOWLEDGEMENTS else None
@@ -1,17 +1,93 @@
 """
 Database manager module for Neo4j operations in MindGarden.
 """
+import hashlib
 import logging
 import os
-from typing import Optional, Dict, Any, List
+import reprlib
+import threading
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Callable, TypeVar
 
 from neo4j import GraphDatabase, Driver, Session
 from pydantic import ValidationError
 
 from mindgarden.config.settings import get_config
+from mindgarden.memory import embeddings
+from mindgarden.memory.embedding_store import EmbeddingStore, shared_store
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# (label, property) pairs that identify nodes and carry a uniqueness constraint
+UNIQUE_KEYS: List[Tuple[str, str]] = [
+    ("Memory", "id"),
+    ("Entity", "name"),
+    ("Topic", "name"),
+]
+
+# Most memories, and characters of content, embedded and saved per batch when
+# backfilling the similarity index
+_BACKFILL_BATCH_SIZE = 256
+_BACKFILL_BATCH_CHARS = 500_000
+
+_SET_EMBEDDINGS_QUERY = """
+UNWIND $rows AS row
+MATCH (m:Memory {id: row.id})
+SET m.embedding = row.embedding
+"""
+
+# Drivers are long-lived and pool their connections, so every manager in the
+# process talking to the same server with the same credentials shares one.
+# Each driver counts the managers using it and is closed when the last one
+# closes.
+_drivers: Dict[Tuple[str, str, str], Driver] = {}
+_driver_users: Dict[Tuple[str, str, str], int] = {}
+_drivers_lock = threading.Lock()
+
+
+def _acquire_driver(uri: str, user: str, password: str) -> Driver:
+    """Get the shared driver for a server and credentials, creating it on first use."""
+    key = (uri, user, password)
+    with _drivers_lock:
+        if key not in _drivers:
+            _drivers[key] = GraphDatabase.driver(
+                uri,
+                auth=(user, password),
+                # Memory writes, extraction threads and agent tools run concurrently
+                max_connection_pool_size=get_config().neo4j_max_connection_pool_size,
+            )
+            _driver_users[key] = 0
+        _driver_users[key] += 1
+        return _drivers[key]
+
+
+def _release_driver(uri: str, user: str, password: str) -> None:
+    """Stop using the shared driver for a server and credentials, closing it if it has no other users."""
+    key = (uri, user, password)
+    with _drivers_lock:
+        _driver_users[key] -= 1
+        if _driver_users[key] > 0:
+            return
+        del _driver_users[key]
+        driver = _drivers.pop(key)
+    driver.close()
+
+
+def _backfill_batches(records: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """Split memory records into batches of at most _BACKFILL_BATCH_SIZE records and _BACKFILL_BATCH_CHARS characters."""
+    batch: List[Dict[str, Any]] = []
+    chars = 0
+    for record in records:
+        size = len(record["content"])
+        if batch and (len(batch) == _BACKFILL_BATCH_SIZE or chars + size > _BACKFILL_BATCH_CHARS):
+            yield batch
+            batch, chars = [], 0
+        batch.append(record)
+        chars += size
+    if batch:
+        yield batch
+
 
 class Neo4jManager:
     """Manages Neo4j database connections and operations for MindGarden."""
@@ -25,16 +101,19 @@ class Neo4jManager:
         logger.info("Neo4jManager initialized with URI: %s, User: %s", self.uri, self.user)
         self.driver = None
         
+        # Similarity index over normalized memory embeddings, opened on first use
+        self.embedding_store: Optional[EmbeddingStore] = None
+        
     def connect(self) -> None:
         """Establish connection to Neo4j database."""
         if not self.password:
             raise ValueError("Neo4j password is required")
             
+        if self.driver:
+            return
+            
         try:
-            self.driver = GraphDatabase.driver(
-                self.uri,
-                auth=(self.user, self.password)
-            )
+            self.driver = _acquire_driver(self.uri, self.user, self.password)
             logger.info(f"Connected to Neo4j at {self.uri}")
         except Exception as e:
             logger.error(f"Failed to connect to Neo4j: {e}")
@@ -42,8 +121,13 @@ class Neo4jManager:
             
     def close(self) -> None:
         """Close the database connection."""
+        if self.embedding_store is not None:
+            self.embedding_store.flush()
+            
         if self.driver:
-            self.driver.close()
+            # The driver itself is only closed once no other manager uses it
+            _release_driver(self.uri, self.user, self.password)
+            self.driver = None
             logger.info("Closed Neo4j connection")
             
     def get_session(self) -> Session:
@@ -73,26 +157,192 @@ class Neo4jManager:
         except Exception as e:
             logger.error(f"Error executing query: {e}")
             logger.error(f"Query: {query}")
-            logger.error(f"Parameters: {parameters}")
+            # Parameters can hold whole embedding batches, so only log their outline
+            logger.error(f"Parameters: {reprlib.repr(parameters)}")
+            raise
+            
+    def write_tx(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a function in a single managed write transaction.
+        
+        All queries the function runs on the transaction commit together, so
+        a sequence of writes pays for one commit. The driver retries the
+        function on transient errors, so it should have no other side effects.
+        
+        Args:
+            fn: Transaction function, called with the transaction and the extra arguments.
+            *args: Positional arguments passed to fn after the transaction.
+            **kwargs: Keyword arguments passed to fn.
+            
+        Returns:
+            The return value of fn.
+        """
+        try:
+            with self.get_session() as session:
+                return session.execute_write(fn, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Error executing write transaction {getattr(fn, '__name__', fn)}: {e}")
             raise
             
     def create_indexes(self) -> None:
-        """Create necessary indexes for the database."""
-        # Memory index
-        self.run_query("CREATE INDEX IF NOT EXISTS FOR (m:Memory) ON (m.id)")
+        """Create necessary constraints and indexes for the database."""
+        # Uniqueness constraints on the keys used by MERGE and MATCH; each is
+        # backed by an index, so lookups are index seeks instead of label scans
+        self._drop_unconstrained_indexes(UNIQUE_KEYS)
+        for label, prop in UNIQUE_KEYS:
+            name = f"{label.lower()}_{prop}_unique"
+            self.run_query(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE")
+        
         # Document index
         self.run_query("CREATE INDEX IF NOT EXISTS FOR (d:Document) ON (d.id)")
-        # Entity index
-        self.run_query("CREATE INDEX IF NOT EXISTS FOR (e:Entity) ON (e.name)")
-        # Topic index
-        self.run_query("CREATE INDEX IF NOT EXISTS FOR (t:Topic) ON (t.name)")
+        # Memory content full-text index
+        self.run_query("CREATE FULLTEXT INDEX memory_content IF NOT EXISTS FOR (m:Memory) ON EACH [m.content]")
+        
+        logger.info("Created database constraints and indexes")
+        
+    def _drop_unconstrained_indexes(self, keys: List[Tuple[str, str]]) -> None:
+        """
+        Drop plain range indexes on properties that get a uniqueness constraint.
+        
+        Databases created by earlier versions have such indexes, and Neo4j
+        refuses to create a constraint over an existing index on the same
+        property.
         
-        logger.info("Created database indexes")
+        Args:
+            keys: (label, property) pairs about to be constrained.
+        """
+        query = """
+        SHOW RANGE INDEXES
+        YIELD name, labelsOrTypes, properties, owningConstraint
+        WHERE owningConstraint IS NULL
+          AND [labelsOrTypes[0], properties[0]] IN $keys
+          AND size(properties) = 1
+        RETURN name
+        """
+        
+        for record in self.run_query(query, {"keys": [list(key) for key in keys]}):
+            self.run_query(f"DROP INDEX `{record['name']}` IF EXISTS")
+            logger.info("Dropped index %s, replaced by a uniqueness constraint", record["name"])
+        
+    def get_embedding_store(self) -> EmbeddingStore:
+        """
+        Get the memory embedding store, opening it on first use.
+        
+        Each Neo4j server and embedding model gets its own file, so the index
+        never returns IDs of memories stored on another server, and rows are
+        never read back with another model's dimension. The store is shared
+        with every other manager in the process using the same server.
+        """
+        if self.embedding_store is None:
+            config = get_config()
+            key = f"{self.uri}|{config.embedding_model}|{config.embedding_dim}"
+            digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+            self.embedding_store = shared_store(
+                config.data_dir / f"embeddings-{digest}-{config.embedding_dim}.i8",
+                dim=config.embedding_dim,
+            )
+        return self.embedding_store
+        
+    def load_memory_index(self) -> None:
+        """
+        Bring the similarity index up to date with the memories in Neo4j.
+        
+        The index persists on disk, so only memories missing from it are
+        loaded, e.g. on first start, after its files were removed, or when it
+        fell behind Neo4j. Missing memories stored without an embedding, such
+        as those written before embeddings were introduced or whose embedding
+        request failed, are embedded now and their embedding saved in Neo4j.
+        They are embedded in batches capped by count and by content size;
+        texts the API rejects are singled out by embed_texts, so the rest of
+        their batch is still indexed.
+        """
+        store = self.get_embedding_store()
+        indexed = set(store.ids)
+        
+        ids = [record["id"] for record in self.run_query("MATCH (m:Memory) RETURN m.id AS id")]
+        missing = [memory_id for memory_id in ids if memory_id not in indexed]
+        if not missing:
+            logger.info("Opened similarity index with %d memory embeddings", len(store))
+            return
+            
+        query = """
+        MATCH (m:Memory)
+        WHERE m.id IN $ids
+        RETURN m.id AS id, m.embedding AS embedding, m.content AS content
+        """
+        
+        results = self.run_query(query, {"ids": missing})
+        embedded = [record for record in results if record["embedding"] is not None]
+        # Blank memories cannot be embedded, and would fail the whole request
+        unembedded = [
+            record for record in results
+            if record["embedding"] is None and (record["content"] or "").strip()
+        ]
+        
+        store.extend([record["id"] for record in embedded], [record["embedding"] for record in embedded])
+        
+        for batch in _backfill_batches(unembedded):
+            try:
+                vectors = embeddings.embed_texts([record["content"] for record in batch])
+            except Exception as e:
+                # The memories stay reachable through full-text search until the next start
+                logger.warning(f"Could not embed {len(batch)} memories for the similarity index: {e}")
+                continue
+                
+            rows = [
+                {"id": record["id"], "embedding": vector}
+                for record, vector in zip(batch, vectors)
+                if vector is not None
+            ]
+            if not rows:
+                continue
+                
+            try:
+                self.run_query(_SET_EMBEDDINGS_QUERY, {"rows": rows})
+            except Exception as e:
+                # Left out of the index too, so the batch is embedded and saved again next start
+                logger.warning(f"Could not save embeddings of {len(rows)} memories: {e}")
+                continue
+                
+            store.extend([row["id"] for row in rows], [row["embedding"] for row in rows])
+            
+        store.flush()
+        
+        logger.info("Added %d memories to the similarity index, which now holds %d", 
+                    len(store) - len(indexed), len(store))
+        
+    def reset_memory_index(self) -> None:
+        """Remove all embeddings from the similarity index."""
+        self.get_embedding_store().clear()
+        
+    def add_to_memory_index(self, memory_id: str, embedding: List[float]) -> None:
+        """
+        Add a memory embedding to the similarity index.
+        
+        Args:
+            memory_id: ID of the memory.
+            embedding: Normalized embedding of the memory content.
+        """
+        self.get_embedding_store().append(memory_id, embedding)
+        
+    def search_memory_index(self, embedding: List[float], limit: int) -> List[Tuple[str, float]]:
+        """
+        Find the memories most similar to an embedding.
+        
+        Args:
+            embedding: Normalized query embedding.
+            limit: Maximum number of results.
+            
+        Returns:
+            A list of (memory ID, cosine similarity) pairs, most similar first.
+        """
+        return self.get_embedding_store().search(embedding, limit)
         
     def setup_database(self) -> None:
         """Set up the database with necessary constraints and indexes."""
         try:
             self.create_indexes()
+            self.load_memory_index()
             logger.info("Database setup complete")
         except Exception as e:
             logger.error(f"Error setting up database: {e}")
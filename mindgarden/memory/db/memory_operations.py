@@ -2,15 +2,64 @@
 Memory database operations for MindGarden.
 """
 import logging
+import re
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+import orjson
+from neo4j import ManagedTransaction
+
+from mindgarden.config.settings import get_config
+from mindgarden.memory import embeddings
 from mindgarden.memory.db.db_manager import Neo4jManager
+from mindgarden.memory.entity.entity_processor import write_extracted
 from mindgarden.memory.models.document import Memory
+from mindgarden.memory.models.entity import ExtractedEntities
 
 logger = logging.getLogger(__name__)
 
+# Characters with special meaning in Lucene query syntax
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+# Words Lucene reads as boolean operators, but only when written in uppercase
+_LUCENE_OPERATORS = re.compile(r"\b(AND|OR|NOT)\b")
+
+_CREATE_MEMORIES_QUERY = """
+UNWIND $rows AS row
+CREATE (m:Memory {
+    id: row.id,
+    content: row.content,
+    source: row.source,
+    timestamp: row.timestamp,
+    date_str: row.date_str,
+    metadata: row.metadata,
+    embedding: row.embedding
+})
+"""
+
+_CONNECT_QUERY = """
+MATCH (m:Memory {id: $memory_id})
+CALL {
+    WITH m
+    UNWIND $entity_names AS entity_name
+    MATCH (e:Entity {name: entity_name})
+    MERGE (m)-[:MENTIONS]->(e)
+}
+CALL {
+    WITH m
+    UNWIND $topics AS topic
+    MERGE (t:Topic {name: topic})
+    MERGE (m)-[:ABOUT]->(t)
+}
+"""
+
+
+def _memory_from_record(record: Dict[str, Any]) -> Memory:
+    """Build a Memory from a projected query record, decoding its JSON metadata."""
+    record["metadata"] = orjson.loads(record["metadata"] or "{}")
+    return Memory(**record)
+
 
 def store_memory(db_manager: Neo4jManager, content: str, source: str, 
                 metadata: Optional[Dict[str, Any]] = None) -> str:
@@ -26,48 +75,141 @@ def store_memory(db_manager: Neo4jManager, content: str, source: str,
     Returns:
         The ID of the stored memory.
     """
-    if metadata is None:
-        metadata = {}
+    return store_memories_batch(db_manager, [(content, source, metadata)])[0]
+
+
+def store_memories_batch(db_manager: Neo4jManager,
+                         items: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> List[str]:
+    """
+    Store several memories with one embedding request and one Cypher query.
+    
+    Args:
+        db_manager: Neo4j database manager.
+        items: (content, source, metadata) tuples, one per memory.
         
-    # Generate a unique ID
-    memory_id = str(uuid.uuid4())
+    Returns:
+        The IDs of the stored memories, in input order.
+    """
+    if not items:
+        return []
+        
+    rows = _memory_rows(items)
     
-    # Get current timestamp
-    timestamp = datetime.now().timestamp()
-    date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        db_manager.run_query(_CREATE_MEMORIES_QUERY, {"rows": rows})
+        _index_memory_rows(db_manager, rows)
+        return [row["id"] for row in rows]
+    except Exception as e:
+        logger.error(f"Error storing memories: {e}")
+        raise
+
+
+def store_memory_with_graph(db_manager: Neo4jManager, content: str, source: str,
+                            metadata: Optional[Dict[str, Any]], extracted: ExtractedEntities) -> str:
+    """
+    Store a memory together with its extracted entities in one transaction.
     
-    # Create parameters for the query
-    parameters = {
-        "id": memory_id,
-        "content": content,
-        "source": source,
-        "timestamp": timestamp,
-        "date_str": date_str,
-        "metadata": metadata
-    }
+    Args:
+        db_manager: Neo4j database manager.
+        content: The memory content.
+        source: Source of the memory (e.g., 'user', 'assistant', 'document').
+        metadata: Additional metadata about the memory.
+        extracted: Entities, relationships, and topics extracted from the content.
+        
+    Returns:
+        The ID of the stored memory.
+    """
+    return store_memories_with_graph(db_manager, [(content, source, metadata, extracted)])[0]
+
+
+def store_memories_with_graph(db_manager: Neo4jManager,
+                              items: List[Tuple[str, str, Optional[Dict[str, Any]], ExtractedEntities]]) -> List[str]:
+    """
+    Store several memories and their extracted entities in one transaction.
     
-    # Create memory node
-    query = """
-    CREATE (m:Memory {
-        id: $id,
-        content: $content,
-        source: $source,
-        timestamp: $timestamp,
-        date_str: $date_str,
-        metadata: $metadata
-    })
-    RETURN m.id as id
+    The memory nodes, entities, relationships, topics, and the edges
+    connecting each memory to its entities and topics are all written in a
+    single managed write transaction, so they commit together. If that
+    transaction fails, the memories are stored without their entities, so
+    the turn is not lost to a bad extraction or a missing APOC plugin.
+    
+    Args:
+        db_manager: Neo4j database manager.
+        items: (content, source, metadata, extracted) tuples, one per memory.
+        
+    Returns:
+        The IDs of the stored memories, in input order.
     """
+    if not items:
+        return []
+        
+    rows = _memory_rows([(content, source, metadata) for content, source, metadata, _ in items])
+    
+    def write(tx: ManagedTransaction) -> None:
+        tx.run(_CREATE_MEMORIES_QUERY, rows=rows)
+        for row, (_, _, _, extracted) in zip(rows, items):
+            write_extracted(tx, extracted)
+            entity_names = [entity.name for entity in extracted.entities]
+            if entity_names or extracted.topics:
+                tx.run(_CONNECT_QUERY, memory_id=row["id"], entity_names=entity_names, topics=extracted.topics)
+    
+    def write_memories(tx: ManagedTransaction) -> None:
+        tx.run(_CREATE_MEMORIES_QUERY, rows=rows)
     
     try:
-        result = db_manager.run_query(query, parameters)
-        logger.info(f"Stored memory {memory_id} from {source}")
-        return memory_id
+        try:
+            db_manager.write_tx(write)
+        except Exception as e:
+            logger.warning(f"Could not store entities with memories, storing the memories alone: {e}")
+            db_manager.write_tx(write_memories)
+            
+        # Index only once the transaction has committed
+        _index_memory_rows(db_manager, rows)
+        return [row["id"] for row in rows]
     except Exception as e:
-        logger.error(f"Error storing memory: {e}")
+        logger.error(f"Error storing memories with entities: {e}")
         raise
 
 
+def _memory_rows(items: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """Build the query rows for new memories, embedding all contents together."""
+    # Get current timestamp, reading the clock once for both forms
+    now = datetime.now()
+    timestamp = now.timestamp()
+    date_str = now.isoformat(sep=" ", timespec="seconds")
+    
+    # Embed all contents together so they can be found by similarity search
+    # later; blank contents, and any the API rejects, are stored without one
+    try:
+        vectors = embeddings.embed_texts([content for content, _, _ in items])
+    except Exception as e:
+        logger.warning(f"Could not embed {len(items)} memories, storing without embeddings: {e}")
+        vectors = [None] * len(items)
+    
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "content": content,
+            "source": source,
+            # Offset slightly so batch order survives ORDER BY timestamp
+            "timestamp": timestamp + index * 0.001,
+            "date_str": date_str,
+            # Neo4j properties cannot hold maps, so metadata is stored as JSON
+            "metadata": orjson.dumps(metadata or {}).decode(),
+            "embedding": embedding
+        }
+        for index, ((content, source, metadata), embedding) in enumerate(zip(items, vectors))
+    ]
+
+
+def _index_memory_rows(db_manager: Neo4jManager, rows: List[Dict[str, Any]]) -> None:
+    """Add stored memory rows to the similarity index."""
+    for row in rows:
+        if row["embedding"] is not None:
+            db_manager.add_to_memory_index(row["id"], row["embedding"])
+        logger.info(f"Stored memory {row['id']} from {row['source']}")
+
+
 def retrieve_memories(db_manager: Neo4jManager, limit: int = 10) -> List[Memory]:
     """
     Retrieve recent memories from the database.
@@ -81,7 +223,12 @@ def retrieve_memories(db_manager: Neo4jManager, limit: int = 10) -> List[Memory]
     """
     query = """
     MATCH (m:Memory)
-    RETURN m
+    RETURN m.id AS id,
+           m.content AS content,
+           m.source AS source,
+           m.timestamp AS timestamp,
+           m.date_str AS date_str,
+           m.metadata AS metadata
     ORDER BY m.timestamp DESC
     LIMIT $limit
     """
@@ -92,24 +239,7 @@ def retrieve_memories(db_manager: Neo4jManager, limit: int = 10) -> List[Memory]
     
     try:
         results = db_manager.run_query(query, parameters)
-        memories = []
-        
-        for record in results:
-            memory_data = record.get('m', {})
-            try:
-                memory = Memory(
-                    id=memory_data.get('id'),
-                    content=memory_data.get('content'),
-                    source=memory_data.get('source'),
-                    timestamp=memory_data.get('timestamp'),
-                    date_str=memory_data.get('date_str'),
-                    metadata=memory_data.get('metadata', {})
-                )
-                memories.append(memory)
-            except Exception as e:
-                logger.error(f"Error creating Memory object: {e}")
-                
-        return memories
+        return [_memory_from_record(record) for record in results]
     except Exception as e:
         logger.error(f"Error retrieving memories: {e}")
         return []
@@ -119,110 +249,144 @@ def search_memories(db_manager: Neo4jManager, query_text: str, limit: int = 5) -
     """
     Search memories by content similarity.
     
+    Memories without an embedding are not in the similarity index, so when
+    it yields fewer than limit matches the rest are filled from a full-text
+    search over those memories.
+    
     Args:
         db_manager: Neo4j database manager.
         query_text: Text to search for.
         limit: Maximum number of memories to retrieve.
         
+    Returns:
+        List of Memory objects, most similar first.
+    """
+    try:
+        query_embedding = embeddings.embed_text(query_text)
+    except Exception as e:
+        logger.warning(f"Could not embed search query, falling back to text search: {e}")
+        return _text_search_memories(db_manager, query_text, limit)
+        
+    if query_embedding is None:
+        # Blank queries match nothing; a query the API rejected can still be matched by text
+        return _text_search_memories(db_manager, query_text, limit) if query_text.strip() else []
+    
+    threshold = get_config().memory_search_threshold
+    matches = [
+        memory_id
+        for memory_id, score in db_manager.search_memory_index(query_embedding, limit)
+        if score >= threshold
+    ]
+    
+    found: List[Memory] = []
+    if matches:
+        # Hydrate all matches in a single round-trip
+        query = """
+        MATCH (m:Memory)
+        WHERE m.id IN $ids
+        RETURN m.id AS id,
+               m.content AS content,
+               m.source AS source,
+               m.timestamp AS timestamp,
+               m.date_str AS date_str,
+               m.metadata AS metadata
+        """
+        
+        parameters = {
+            "ids": matches
+        }
+        
+        try:
+            results = db_manager.run_query(query, parameters)
+            memories = {record["id"]: _memory_from_record(record) for record in results}
+            
+            # Preserve similarity order
+            found = [memories[memory_id] for memory_id in matches if memory_id in memories]
+        except Exception as e:
+            logger.error(f"Error searching memories: {e}")
+            return []
+    
+    if len(found) < limit:
+        found += _text_search_memories(db_manager, query_text, limit - len(found), unembedded_only=True)
+        
+    return found
+
+
+def _text_search_memories(db_manager: Neo4jManager, query_text: str, limit: int = 5,
+                          unembedded_only: bool = False) -> List[Memory]:
+    """
+    Search memories with the full-text index.
+    
+    Used when the query cannot be embedded, and for memories that have no
+    embedding and so cannot be found by similarity.
+    
+    Args:
+        db_manager: Neo4j database manager.
+        query_text: Text to search for.
+        limit: Maximum number of memories to retrieve.
+        unembedded_only: Only search memories stored without an embedding.
+        
     Returns:
         List of Memory objects.
     """
-    # In a future implementation, this would use vector embeddings
-    # For now, we'll use a simple text search
+    # Match the words of the query literally rather than as Lucene syntax
+    escaped_query = _LUCENE_SPECIAL.sub(r"\\\1", query_text.strip())
+    escaped_query = _LUCENE_OPERATORS.sub(lambda match: match.group().lower(), escaped_query)
+    if not escaped_query:
+        return []
+    
     query = """
-    MATCH (m:Memory)
-    WHERE m.content CONTAINS $query_text
-    RETURN m
-    ORDER BY m.timestamp DESC
+    CALL db.index.fulltext.queryNodes('memory_content', $query_text) YIELD node AS m, score
+    WHERE NOT $unembedded_only OR m.embedding IS NULL
+    RETURN m.id AS id,
+           m.content AS content,
+           m.source AS source,
+           m.timestamp AS timestamp,
+           m.date_str AS date_str,
+           m.metadata AS metadata
+    ORDER BY score DESC
     LIMIT $limit
     """
     
     parameters = {
-        "query_text": query_text,
+        "query_text": escaped_query,
+        "unembedded_only": unembedded_only,
         "limit": limit
     }
     
     try:
         results = db_manager.run_query(query, parameters)
-        memories = []
-        
-        for record in results:
-            memory_data = record.get('m', {})
-            try:
-                memory = Memory(
-                    id=memory_data.get('id'),
-                    content=memory_data.get('content'),
-                    source=memory_data.get('source'),
-                    timestamp=memory_data.get('timestamp'),
-                    date_str=memory_data.get('date_str'),
-                    metadata=memory_data.get('metadata', {})
-                )
-                memories.append(memory)
-            except Exception as e:
-                logger.error(f"Error creating Memory object: {e}")
-                
-        return memories
+        return [_memory_from_record(record) for record in results]
     except Exception as e:
         logger.error(f"Error searching memories: {e}")
         return []
 
 
-def connect_memory_to_entities(db_manager: Neo4jManager, memory_id: str, entity_names: List[str]) -> None:
+def connect_memory_to_entities_and_topics(db_manager: Neo4jManager, memory_id: str,
+                                          entity_names: List[str], topics: List[str]) -> None:
     """
-    Connect a memory to entities.
+    Connect a memory to entities and topics with a single query.
     
     Args:
         db_manager: Neo4j database manager.
         memory_id: ID of the memory.
         entity_names: List of entity names to connect to.
-    """
-    for entity_name in entity_names:
-        query = """
-        MATCH (m:Memory {id: $memory_id})
-        MATCH (e:Entity {name: $entity_name})
-        MERGE (m)-[r:MENTIONS]->(e)
-        RETURN r
-        """
-        
-        parameters = {
-            "memory_id": memory_id,
-            "entity_name": entity_name
-        }
-        
-        try:
-            db_manager.run_query(query, parameters)
-            logger.debug(f"Connected memory {memory_id} to entity {entity_name}")
-        except Exception as e:
-            logger.error(f"Error connecting memory to entity: {e}")
-
-
-def connect_memory_to_topics(db_manager: Neo4jManager, memory_id: str, topics: List[str]) -> None:
-    """
-    Connect a memory to topics.
-    
-    Args:
-        db_manager: Neo4j database manager.
-        memory_id: ID of the memory.
         topics: List of topics to connect to.
     """
-    for topic in topics:
-        query = """
-        MATCH (m:Memory {id: $memory_id})
-        MERGE (t:Topic {name: $topic})
-        MERGE (m)-[r:ABOUT]->(t)
-        RETURN r
-        """
+    if not entity_names and not topics:
+        return
         
-        parameters = {
-            "memory_id": memory_id,
-            "topic": topic
-        }
-        
-        try:
-            db_manager.run_query(query, parameters)
-            logger.debug(f"Connected memory {memory_id} to topic {topic}")
-        except Exception as e:
-            logger.error(f"Error connecting memory to topic: {e}")
+    parameters = {
+        "memory_id": memory_id,
+        "entity_names": entity_names,
+        "topics": topics
+    }
+    
+    try:
+        db_manager.run_query(_CONNECT_QUERY, parameters)
+        logger.debug(f"Connected memory {memory_id} to {len(entity_names)} entities and {len(topics)} topics")
+    except Exception as e:
+        logger.error(f"Error connecting memory to entities and topics: {e}")
 
 
 def retrieve_memories_by_entity(db_manager: Neo4jManager, entity_name: str, limit: int = 5) -> List[Memory]:
@@ -239,7 +403,12 @@ def retrieve_memories_by_entity(db_manager: Neo4jManager, entity_name: str, limi
     """
     query = """
     MATCH (m:Memory)-[:MENTIONS]->(e:Entity {name: $entity_name})
-    RETURN m
+    RETURN m.id AS id,
+           m.content AS content,
+           m.source AS source,
+           m.timestamp AS timestamp,
+           m.date_str AS date_str,
+           m.metadata AS metadata
     ORDER BY m.timestamp DESC
     LIMIT $limit
     """
@@ -251,24 +420,7 @@ def retrieve_memories_by_entity(db_manager: Neo4jManager, entity_name: str, limi
     
     try:
         results = db_manager.run_query(query, parameters)
-        memories = []
-        
-        for record in results:
-            memory_data = record.get('m', {})
-            try:
-                memory = Memory(
-                    id=memory_data.get('id'),
-                    content=memory_data.get('content'),
-                    source=memory_data.get('source'),
-                    timestamp=memory_data.get('timestamp'),
-                    date_str=memory_data.get('date_str'),
-                    metadata=memory_data.get('metadata', {})
-                )
-                memories.append(memory)
-            except Exception as e:
-                logger.error(f"Error creating Memory object: {e}")
-                
-        return memories
+        return [_memory_from_record(record) for record in results]
     except Exception as e:
         logger.error(f"Error retrieving memories by entity: {e}")
         return [] 
\ No newline at end of file
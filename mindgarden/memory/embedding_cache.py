@@ -0,0 +1,93 @@
+"""
+Persistent embedding cache for MindGarden memory search.
+"""
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from diskcache import Cache
+
+from mindgarden.config.settings import get_config
+from mindgarden.memory.acknowledgements import normalize_acknowledgement
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Disk-backed cache of content embeddings.
+
+    Embeddings are stored under a hash of the model name and the exact content.
+    A second key over a normalized form of the content (case-folded, whitespace
+    collapsed) points at the first embedding stored for that form, so
+    near-duplicates such as "Hello Quinn" and "hello  quinn" reuse one
+    embedding instead of calling the API again. Punctuation is only ignored
+    for bare acknowledgements such as "Thanks!", since elsewhere it can change
+    the meaning, as in "C++" and "C#". Including the model name in both keys
+    invalidates the cache when the embedding model changes.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, model: Optional[str] = None):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            directory: Directory for the cache files. Defaults to the data directory.
+            model: Embedding model name. Defaults to the configured embedding model.
+        """
+        config = get_config()
+        self.model = model or config.embedding_model
+        self.cache = Cache(str(directory or config.data_dir / "embedding_cache"))
+
+    def get(self, content: str) -> Optional[List[float]]:
+        """
+        Look up the embedding of some content.
+
+        Args:
+            content: The content to look up.
+
+        Returns:
+            The cached embedding, or None on a miss.
+        """
+        value = self.cache.get(self._exact_key(content))
+
+        if value is None:
+            fuzzy_key = self._fuzzy_key(content)
+            exact_key = self.cache.get(fuzzy_key) if fuzzy_key else None
+            value = self.cache.get(exact_key) if exact_key else None
+
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=np.float32).tolist()
+
+    def set(self, content: str, embedding: List[float]) -> None:
+        """
+        Store the embedding of some content.
+
+        Args:
+            content: The embedded content.
+            embedding: Its embedding.
+        """
+        exact_key = self._exact_key(content)
+        self.cache.set(exact_key, np.asarray(embedding, dtype=np.float32).tobytes())
+
+        fuzzy_key = self._fuzzy_key(content)
+        if fuzzy_key:
+            self.cache.add(fuzzy_key, exact_key)
+
+    def close(self) -> None:
+        """Close the underlying cache files."""
+        self.cache.close()
+
+    def _exact_key(self, content: str) -> str:
+        """Build the cache key for the exact content."""
+        return hashlib.sha256(f"{self.model}:{content}".encode()).hexdigest()
+
+    def _fuzzy_key(self, content: str) -> Optional[str]:
+        """Build the cache key for the normalized content, if anything remains after normalizing."""
+        normalized = normalize_acknowledgement(content) or " ".join(content.casefold().split())
+        if not normalized:
+            return None
+        return hashlib.sha256(f"{self.model}:~{normalized}".encode()).hexdigest()
@@ -0,0 +1,269 @@
+"""
+Memory-mapped embedding store for MindGarden memory search.
+"""
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import simsimd
+
+from mindgarden.config.settings import get_config
+
+try:
+    import fcntl
+except ImportError:  # Windows: the store is only coordinated within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Stores open in this process, one per matrix file, so that every user of a
+# file appends through the same row count
+_stores: Dict[Path, "EmbeddingStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def quantize(vectors: List[List[float]]) -> np.ndarray:
+    """
+    Quantize embeddings to int8 for storage and scoring.
+
+    Each vector is scaled so its largest component maps to 127. Cosine
+    similarity ignores per-vector scale, so this keeps the full int8 range
+    for every vector at no cost to the scores.
+
+    Args:
+        vectors: The embeddings to quantize.
+
+    Returns:
+        An int8 array with one row per embedding.
+    """
+    array = np.asarray(vectors, dtype=np.float32)
+    scale = np.abs(array).max(axis=-1, keepdims=True)
+    scale[scale == 0] = 1.0
+    return np.clip(np.round(array / scale * 127), -128, 127).astype(np.int8)
+
+
+class EmbeddingStore:
+    """
+    Append-only matrix of normalized memory embeddings backed by a file.
+
+    The matrix lives in a memory-mapped file, so processes opening the same
+    store share its pages through the OS page cache and the embeddings survive
+    restarts without being reloaded from Neo4j. Embeddings are stored
+    quantized to int8, a quarter of the float32 size, and scored with the
+    int8 cosine kernel. The memory ID of each row is kept in a sidecar
+    ``.ids`` file, one per line. Appends and clears take an exclusive lock
+    on a sidecar ``.lock`` file, and searches a shared one. Under the lock
+    each instance reads the IDs other processes appended since it last
+    looked, and rereads them all when the store was cleared, which writes a
+    new generation token to the lock file. Several processes can therefore
+    append to and search one store without overwriting or misreading each
+    other's rows. Within a process every user of a file should share the
+    instance returned by shared_store(); methods are safe to call from
+    several threads.
+    """
+
+    def __init__(self, path: Optional[Path] = None, dim: Optional[int] = None, chunk_rows: int = 10_000):
+        """
+        Open or create an embedding store.
+
+        Args:
+            path: Matrix file path. Defaults to ``embeddings.i8`` in the data directory.
+            dim: Embedding dimension. Defaults to the configured embedding dimension.
+            chunk_rows: Number of rows the file grows by when it is full.
+        """
+        config = get_config()
+        self.dim = dim or config.embedding_dim
+        self.path = Path(path or config.data_dir / "embeddings.i8")
+        self.ids_path = self.path.with_suffix(".ids")
+        self.lock_path = self.path.with_suffix(".lock")
+        self.chunk_rows = chunk_rows
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.ids: List[str] = []
+        # Bytes of the .ids file already read into ids, and the generation they belong to
+        self._ids_offset = 0
+        self._generation: Optional[str] = None
+        # Guards the row count and the mapping, which grows by remapping the file
+        self._lock = threading.RLock()
+        self._open(1)
+        with self._lock, self._file_lock(shared=True) as lock_file:
+            self._sync_ids(lock_file)
+
+    def __len__(self) -> int:
+        """Number of stored embeddings."""
+        return len(self.ids)
+
+    def append(self, memory_id: str, embedding: List[float]) -> None:
+        """
+        Append the embedding of a memory.
+
+        Args:
+            memory_id: ID of the memory.
+            embedding: Normalized embedding of the memory content.
+        """
+        self.extend([memory_id], [embedding])
+
+    def extend(self, memory_ids: List[str], vectors: List[List[float]]) -> None:
+        """
+        Append the embeddings of several memories.
+
+        Args:
+            memory_ids: IDs of the memories.
+            vectors: Normalized embeddings, one per memory ID.
+        """
+        if not memory_ids:
+            return
+
+        with self._lock, self._file_lock() as lock_file:
+            # Other processes may have appended since we last looked, so the
+            # recorded IDs, not our own count, decide where the new rows go
+            self._sync_ids(lock_file)
+            count = len(self.ids)
+            if count + len(memory_ids) > len(self.matrix):
+                self._open(count + len(memory_ids))
+
+            # Write the vectors before the IDs, so every recorded ID has its row
+            self.matrix[count:count + len(memory_ids)] = quantize(vectors)
+            self.matrix.flush()
+            data = "".join(f"{memory_id}\n" for memory_id in memory_ids).encode()
+            with self.ids_path.open("ab") as ids_file:
+                ids_file.write(data)
+            self.ids.extend(memory_ids)
+            self._ids_offset += len(data)
+
+    def search(self, embedding: List[float], limit: int) -> List[Tuple[str, float]]:
+        """
+        Find the memories most similar to an embedding.
+
+        Args:
+            embedding: Normalized query embedding.
+            limit: Maximum number of results.
+
+        Returns:
+            A list of (memory ID, cosine similarity) pairs, most similar first.
+        """
+        if limit <= 0:
+            return []
+
+        # Held while scoring, so no other process clears and rewrites the rows
+        with self._lock, self._file_lock(shared=True) as lock_file:
+            self._sync_ids(lock_file)
+            count = len(self.ids)
+            if not count:
+                return []
+
+            # The mapped rows are scored in place; only the query is copied
+            query = quantize([embedding])
+            distances = simsimd.cdist(query, self.matrix[:count], metric="cosine")
+            ids = self.ids[:count]
+        scores = 1.0 - np.asarray(distances, dtype=np.float32)[0]
+
+        # Select the top-k in O(N), then order only those k
+        k = min(limit, count)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+
+        return [(ids[index], float(scores[index])) for index in top]
+
+    def clear(self) -> None:
+        """Remove all embeddings, keeping the allocated file."""
+        with self._lock, self._file_lock() as lock_file:
+            # A new generation tells other processes to drop the IDs they hold
+            generation = uuid.uuid4().hex
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(generation)
+            lock_file.flush()
+            self.ids_path.write_text("")
+            self.ids = []
+            self._ids_offset = 0
+            self._generation = generation
+
+    def flush(self) -> None:
+        """Write pending changes to the matrix file."""
+        with self._lock:
+            self.matrix.flush()
+
+    def _sync_ids(self, lock_file: IO[str]) -> None:
+        """
+        Catch up with the IDs recorded in the sidecar file, holding the file lock.
+
+        Only the bytes appended since the last call are read, unless the store
+        was cleared since, in which case every ID is read again. The mapping
+        is grown if other processes grew the matrix past it.
+        """
+        lock_file.seek(0)
+        generation = lock_file.read()
+        size = self.ids_path.stat().st_size if self.ids_path.exists() else 0
+        if generation != self._generation or size < self._ids_offset:
+            self.ids = []
+            self._ids_offset = 0
+            self._generation = generation
+
+        if size > self._ids_offset:
+            with self.ids_path.open("rb") as ids_file:
+                ids_file.seek(self._ids_offset)
+                data = ids_file.read(size - self._ids_offset)
+            self.ids.extend(data.decode().split())
+            self._ids_offset = size
+
+        if len(self.ids) > len(self.matrix):
+            self._open(len(self.ids))
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False) -> Iterator[IO[str]]:
+        """Hold a lock on the store across processes, yielding the open lock file."""
+        with self.lock_path.open("a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield lock_file
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _open(self, min_rows: int) -> None:
+        """Map the matrix file, growing it in whole chunks to hold at least min_rows rows."""
+        row_bytes = self.dim * np.dtype(np.int8).itemsize
+        rows = -(-min_rows // self.chunk_rows) * self.chunk_rows
+
+        if hasattr(self, "matrix"):
+            self.matrix.flush()
+            del self.matrix
+
+        with self.path.open("ab") as matrix_file:
+            current_rows = os.fstat(matrix_file.fileno()).st_size // row_bytes
+            if current_rows < rows:
+                os.ftruncate(matrix_file.fileno(), rows * row_bytes)
+                logger.debug("Grew embedding store %s to %d rows", self.path, rows)
+            else:
+                rows = current_rows
+
+        self.matrix = np.memmap(self.path, dtype=np.int8, mode="r+", shape=(rows, self.dim))
+
+
+def shared_store(path: Path, dim: Optional[int] = None) -> EmbeddingStore:
+    """
+    Get the store for a matrix file shared by this process, opening it on first use.
+
+    Separate instances over one file would each keep their own row count and
+    overwrite each other's rows, so every user of a file should go through
+    this function.
+
+    Args:
+        path: Matrix file path.
+        dim: Embedding dimension. Defaults to the configured embedding dimension.
+        
+    Returns:
+        The shared embedding store.
+    """
+    key = Path(path).resolve()
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EmbeddingStore(path=key, dim=dim)
+        return _stores[key]
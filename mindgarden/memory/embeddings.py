@@ -0,0 +1,129 @@
+"""
+Embedding utilities for MindGarden memory search.
+"""
+import logging
+from typing import List, Optional
+
+import numpy as np
+from openai import BadRequestError
+
+from mindgarden.core.clients import get_openai_client
+from mindgarden.memory.embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# Longest text sent for embedding; longer texts are embedded by their start.
+# Kept well under the 8191-token input limit of the embedding models.
+_MAX_INPUT_CHARS = 20_000
+
+# Most texts and characters sent in one request, under the API's per-request limits
+_MAX_REQUEST_INPUTS = 2048
+_MAX_REQUEST_CHARS = 600_000
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def _get_cache() -> EmbeddingCache:
+    """Get the shared embedding cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
+
+
+def normalize(vector: List[float]) -> List[float]:
+    """
+    L2-normalize a vector so that inner product equals cosine similarity.
+
+    Args:
+        vector: The vector to normalize.
+
+    Returns:
+        The normalized vector.
+    """
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    if norm == 0:
+        return array.tolist()
+    return (array / norm).tolist()
+
+
+def embed_texts(texts: List[str]) -> List[Optional[List[float]]]:
+    """
+    Compute normalized embeddings for a list of texts.
+
+    Cached embeddings are reused and only the remaining texts are sent to
+    the API, in as few requests as its limits allow. Blank texts cannot be
+    embedded and would fail the whole request, so they are skipped. Long
+    texts are cut to their first _MAX_INPUT_CHARS characters. When the API
+    rejects a request, it is split to find the texts it rejects, so the
+    other texts still get their embeddings.
+
+    Args:
+        texts: The texts to embed.
+
+    Returns:
+        One normalized embedding per input text, in input order, or None
+        for blank texts and texts the API rejects.
+    """
+    if not texts:
+        return []
+
+    cache = _get_cache()
+    vectors = [cache.get(text) if text.strip() else None for text in texts]
+    missing = [i for i, vector in enumerate(vectors) if vector is None and texts[i].strip()]
+
+    batch: List[int] = []
+    batch_chars = 0
+    for i in missing:
+        chars = min(len(texts[i]), _MAX_INPUT_CHARS)
+        if batch and (len(batch) == _MAX_REQUEST_INPUTS or batch_chars + chars > _MAX_REQUEST_CHARS):
+            _embed_request(cache, texts, batch, vectors)
+            batch, batch_chars = [], 0
+        batch.append(i)
+        batch_chars += chars
+    if batch:
+        _embed_request(cache, texts, batch, vectors)
+
+    logger.debug("Embedded %d texts, %d from cache", len(texts), len(texts) - len(missing))
+    return vectors
+
+
+def _embed_request(
+    cache: EmbeddingCache,
+    texts: List[str],
+    indices: List[int],
+    vectors: List[Optional[List[float]]],
+) -> None:
+    """Embed the texts at the given indices in one request, splitting it while the API rejects it."""
+    try:
+        response = get_openai_client().embeddings.create(
+            model=cache.model,
+            input=[texts[i][:_MAX_INPUT_CHARS] for i in indices],
+        )
+    except BadRequestError as e:
+        if len(indices) == 1:
+            logger.warning(f"Could not embed a text of {len(texts[indices[0]])} characters: {e}")
+            return
+        middle = len(indices) // 2
+        _embed_request(cache, texts, indices[:middle], vectors)
+        _embed_request(cache, texts, indices[middle:], vectors)
+        return
+
+    for item in response.data:
+        i = indices[item.index]
+        vectors[i] = normalize(item.embedding)
+        cache.set(texts[i], vectors[i])
+
+
+def embed_text(text: str) -> Optional[List[float]]:
+    """
+    Compute a normalized embedding for a single text.
+
+    Args:
+        text: The text to embed.
+
+    Returns:
+        The normalized embedding, or None if the text is blank.
+    """
+    return embed_texts([text])[0]
@@ -1,18 +1,261 @@
 """
 Entity processing module for MindGarden memory system.
 """
+import hashlib
 import logging
+import threading
 import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Executor
 from typing import List, Dict, Any, Optional
 
-from openai import OpenAI
+from neo4j import ManagedTransaction
+from pydantic import BaseModel
 
 from mindgarden.config.settings import get_config
+from mindgarden.core.clients import get_openai_client
+from mindgarden.memory.acknowledgements import normalize_acknowledgement
 from mindgarden.memory.db.db_manager import Neo4jManager
 from mindgarden.memory.models.entity import Entity, Relationship, ExtractedEntities
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of extraction results kept in memory
+EXTRACTION_CACHE_SIZE = 1024
+
+_STORE_ENTITIES_QUERY = """
+UNWIND $rows AS row
+MERGE (e:Entity {name: row.name})
+ON CREATE SET e.entity_type = row.entity_type,
+              e.aliases = row.aliases,
+              e.description = row.description,
+              e.created_at = timestamp()
+ON MATCH SET e.entity_type = row.entity_type,
+             e.aliases = row.aliases,
+             e.description = row.description,
+             e.updated_at = timestamp()
+"""
+
+_STORE_RELATIONSHIPS_QUERY = """
+UNWIND $rows AS row
+MATCH (source:Entity {name: row.source})
+MATCH (target:Entity {name: row.target})
+CALL apoc.merge.relationship(
+    source, row.relationship_type, {},
+    {description: row.description, confidence: row.confidence, created_at: timestamp()},
+    target,
+    {description: row.description, confidence: row.confidence, updated_at: timestamp()}
+) YIELD rel
+RETURN count(rel) AS count
+"""
+
+_STORE_TOPICS_QUERY = """
+UNWIND $names AS name
+MERGE (t:Topic {name: name})
+ON CREATE SET t.created_at = timestamp()
+ON MATCH SET t.updated_at = timestamp()
+"""
+
+def is_trivial_text(text: str) -> bool:
+    """
+    Check whether text cannot contain anything worth extracting.
+    
+    Args:
+        text: The text to check.
+        
+    Returns:
+        True for text without letters or a bare acknowledgement such as "ok" or "thanks!".
+    """
+    if not any(char.isalpha() for char in text):
+        return True
+    return normalize_acknowledgement(text) is not None
+
+
+def split_content_defined(text: str, mask: int = 63, min_lines: int = 16, max_lines: int = 256) -> List[str]:
+    """
+    Split text into blocks at content-defined line boundaries.
+    
+    A block ends after a non-blank line whose hash has no bits in common
+    with mask, so boundaries depend only on nearby content. Editing part of
+    a document changes the blocks around the edit and leaves the others
+    unchanged. Blank lines never end a block, so paragraph breaks do not
+    split the document. Blocks hold at least min_lines lines, except the
+    last, and at most max_lines. With the default mask, boundary lines
+    occur about once every 64 non-blank lines.
+    
+    Args:
+        text: The text to split.
+        mask: Bit mask selecting boundary lines; one less than a power of two.
+        min_lines: Minimum number of lines in a block before it may end.
+        max_lines: Number of lines after which a block ends regardless of content.
+        
+    Returns:
+        The blocks, which concatenate back to the original text.
+    """
+    blocks = []
+    block_lines: List[str] = []
+    
+    for line in text.splitlines(keepends=True):
+        block_lines.append(line)
+        stripped = line.strip()
+        if len(block_lines) >= max_lines:
+            boundary = True
+        elif len(block_lines) < min_lines or not stripped:
+            boundary = False
+        else:
+            # crc32 is stable across runs, unlike the salted built-in hash()
+            boundary = zlib.crc32(stripped.encode()) & mask == 0
+            
+        if boundary:
+            blocks.append("".join(block_lines))
+            block_lines = []
+            
+    if block_lines:
+        blocks.append("".join(block_lines))
+        
+    return blocks
+
+
+def write_extracted(tx: ManagedTransaction, extracted: ExtractedEntities) -> None:
+    """
+    Write extracted entities, relationships, and topics in a transaction.
+    
+    Each kind of item is written with one query, however many were extracted,
+    so callers can add them to a larger transaction. Relationships without a
+    type are dropped first, so one bad extraction does not fail the
+    transaction.
+    
+    Args:
+        tx: The transaction to write in.
+        extracted: The extracted entities to write.
+    """
+    _write_entities(tx, extracted.entities)
+    _write_relationships(tx, writable_relationships(extracted))
+    _write_topics(tx, extracted.topics)
+
+
+def writable_relationships(extracted: ExtractedEntities) -> List[Relationship]:
+    """
+    Select the extracted relationships that can be written.
+    
+    apoc.merge.relationship fails on a blank relationship type, which would
+    roll back the whole transaction. Endpoints are left to the query, which
+    skips relationships whose entities are not in the graph.
+    
+    Args:
+        extracted: The extracted entities and relationships.
+        
+    Returns:
+        The relationships with a relationship type.
+    """
+    relationships = [
+        relationship
+        for relationship in extracted.relationships
+        if relationship.relationship_type.strip()
+    ]
+    
+    dropped = len(extracted.relationships) - len(relationships)
+    if dropped:
+        logger.warning("Dropped %d extracted relationships without a relationship type", dropped)
+        
+    return relationships
+
+
+def _write_entities(tx: ManagedTransaction, entities: List[Entity]) -> None:
+    """
+    Write entities with a single query.
+    
+    Args:
+        tx: The transaction to write in.
+        entities: The entities to write.
+    """
+    if not entities:
+        return
+        
+    rows = [
+        {
+            "name": entity.name,
+            "entity_type": entity.entity_type,
+            "aliases": entity.aliases,
+            "description": entity.description or "",
+        }
+        for entity in entities
+    ]
+    
+    tx.run(_STORE_ENTITIES_QUERY, rows=rows)
+
+
+def _write_relationships(tx: ManagedTransaction, relationships: List[Relationship]) -> None:
+    """
+    Write relationships between entities with a single query.
+    
+    The relationship type is passed to apoc.merge.relationship as data, so
+    it is never spliced into the query text and one query serves every type.
+    
+    Args:
+        tx: The transaction to write in.
+        relationships: The relationships to write.
+    """
+    if not relationships:
+        return
+        
+    rows = [
+        {
+            "source": relationship.source,
+            "target": relationship.target,
+            "relationship_type": relationship.relationship_type,
+            "description": relationship.description or "",
+            "confidence": relationship.confidence,
+        }
+        for relationship in relationships
+    ]
+    
+    tx.run(_STORE_RELATIONSHIPS_QUERY, rows=rows)
+
+
+def _write_topics(tx: ManagedTransaction, topics: List[str]) -> None:
+    """
+    Write topics with a single query.
+    
+    Args:
+        tx: The transaction to write in.
+        topics: The topics to write.
+    """
+    if not topics:
+        return
+        
+    tx.run(_STORE_TOPICS_QUERY, names=topics)
+
+
+class _ExtractedEntity(BaseModel):
+    """Entity as returned by the extraction model."""
+    name: str
+    entity_type: str
+    aliases: List[str]
+    description: Optional[str]
+
+
+class _ExtractedRelationship(BaseModel):
+    """Relationship as returned by the extraction model."""
+    source: str
+    target: str
+    relationship_type: str
+    description: Optional[str]
+    confidence: float
+
+
+class _ExtractionResponse(BaseModel):
+    """
+    Structured output schema for entity extraction.
+    
+    Mirrors ExtractedEntities without the free-form metadata fields, which
+    strict structured outputs cannot describe.
+    """
+    entities: List[_ExtractedEntity]
+    relationships: List[_ExtractedRelationship]
+    topics: List[str]
+
 
 class EntityProcessor:
     """Processor for entity extraction and relationship identification."""
@@ -25,8 +268,10 @@ class EntityProcessor:
             db_manager: Optional Neo4j database manager.
         """
         self.config = get_config()
-        self.client = OpenAI(api_key=self.config.openai_api_key)
+        self.client = get_openai_client()
         self.db_manager = db_manager
+        self._extract_cache: "OrderedDict[str, ExtractedEntities]" = OrderedDict()
+        self._extract_cache_lock = threading.Lock()
         
     def extract_entities_from_text(self, text: str, instructions: str = "") -> ExtractedEntities:
         """
@@ -39,6 +284,19 @@ class EntityProcessor:
         Returns:
             An ExtractedEntities instance with the extracted information.
         """
+        if is_trivial_text(text):
+            return ExtractedEntities(entities=[], relationships=[], topics=[])
+            
+        # Identical text and instructions give the same extraction, so reuse it
+        key = hashlib.blake2b(f"{text}\x00{instructions}".encode(), digest_size=16).hexdigest()
+        with self._extract_cache_lock:
+            cached = self._extract_cache.get(key)
+            if cached is not None:
+                self._extract_cache.move_to_end(key)
+        if cached is not None:
+            logger.debug("Reusing cached entity extraction")
+            return cached
+            
         system_prompt = (
             "You are an expert text analysis assistant. Extract all relevant entities, topics, and relationships from the text. "
             "For entities, identify their 'name', 'entity_type', and optionally 'aliases' and 'description'. "
@@ -49,9 +307,10 @@ class EntityProcessor:
         user_prompt = f"Text: {text}\nInstructions: {instructions}"
         
         try:
-            completion = self.client.chat.completions.create(
+            # Structured outputs constrain the response to the extraction schema
+            completion = self.client.beta.chat.completions.parse(
                 model=self.config.model,
-                response_format={"type": "json_object"},
+                response_format=_ExtractionResponse,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
@@ -59,54 +318,71 @@ class EntityProcessor:
                 temperature=0.2,
             )
             
-            response_content = completion.choices[0].message.content
-            
-            # Parse the response into the ExtractedEntities model
-            # You might need additional parsing logic here depending on the response format
-            
-            # For simplicity, we'll use a minimal approach for now
-            import json
-            data = json.loads(response_content)
-            
-            # Process entities
-            entities = []
-            for entity_data in data.get("entities", []):
-                entity = Entity(
-                    name=entity_data.get("name", "Unknown"),
-                    entity_type=entity_data.get("entity_type", "unknown"),
-                    aliases=entity_data.get("aliases", []),
-                    description=entity_data.get("description"),
-                    metadata=entity_data.get("metadata", {})
-                )
-                entities.append(entity)
-                
-            # Process relationships
-            relationships = []
-            for rel_data in data.get("relationships", []):
-                relationship = Relationship(
-                    source=rel_data.get("source", "Unknown"),
-                    target=rel_data.get("target", "Unknown"),
-                    relationship_type=rel_data.get("relationship_type", "unknown"),
-                    description=rel_data.get("description"),
-                    confidence=rel_data.get("confidence", 1.0),
-                    metadata=rel_data.get("metadata", {})
-                )
-                relationships.append(relationship)
+            parsed = completion.choices[0].message.parsed
+            if parsed is None:
+                logger.warning("Entity extraction returned no result: %s", completion.choices[0].message.refusal)
+                return ExtractedEntities(entities=[], relationships=[], topics=[])
                 
-            # Get topics
-            topics = data.get("topics", [])
+            result = ExtractedEntities.model_validate(parsed, from_attributes=True)
             
-            return ExtractedEntities(
-                entities=entities,
-                relationships=relationships,
-                topics=topics
-            )
+            # Only successful extractions are cached, evicting the least recently used
+            with self._extract_cache_lock:
+                self._extract_cache[key] = result
+                if len(self._extract_cache) > EXTRACTION_CACHE_SIZE:
+                    self._extract_cache.popitem(last=False)
+                
+            return result
             
         except Exception as e:
             logger.error(f"Error extracting entities: {e}")
             # Return empty results on error
             return ExtractedEntities(entities=[], relationships=[], topics=[])
             
+    def extract_entities_from_document(self, text: str, instructions: str = "",
+                                       executor: Optional[Executor] = None) -> ExtractedEntities:
+        """
+        Extract entities, topics, and relationships from a possibly long document.
+        
+        The document is split into content-defined blocks that are extracted
+        separately, so blocks that were already extracted, for example in an
+        earlier version of the same document, come from the extraction cache.
+        The results are merged, keeping the first occurrence of each entity,
+        relationship and topic.
+        
+        Args:
+            text: The document text to extract entities from.
+            instructions: Optional instructions for the extraction.
+            executor: Optional executor to extract the blocks concurrently.
+            
+        Returns:
+            An ExtractedEntities instance with the merged information.
+        """
+        entities: Dict[str, Entity] = {}
+        relationships: Dict[tuple, Relationship] = {}
+        topics: Dict[str, None] = {}
+        
+        blocks = [block for block in split_content_defined(text) if block.strip()]
+        
+        def extract(block: str) -> ExtractedEntities:
+            return self.extract_entities_from_text(block, instructions)
+            
+        # map() keeps block order, so the merge is the same either way
+        results = executor.map(extract, blocks) if executor else map(extract, blocks)
+        
+        for extracted in results:
+            for entity in extracted.entities:
+                entities.setdefault(entity.name, entity)
+            for relationship in extracted.relationships:
+                key = (relationship.source, relationship.target, relationship.relationship_type)
+                relationships.setdefault(key, relationship)
+            topics.update(dict.fromkeys(extracted.topics))
+            
+        return ExtractedEntities(
+            entities=list(entities.values()),
+            relationships=list(relationships.values()),
+            topics=list(topics)
+        )
+        
     def store_entities(self, extracted: ExtractedEntities) -> None:
         """
         Store extracted entities in the database.
@@ -119,17 +395,7 @@ class EntityProcessor:
             return
             
         try:
-            # Store entities
-            for entity in extracted.entities:
-                self._store_entity(entity)
-                
-            # Store relationships
-            for relationship in extracted.relationships:
-                self._store_relationship(relationship)
-                
-            # Store topics
-            for topic in extracted.topics:
-                self._store_topic(topic)
+            self.db_manager.write_tx(write_extracted, extracted)
                 
             logger.info("Stored %d entities, %d relationships, and %d topics", 
                       len(extracted.entities), len(extracted.relationships), len(extracted.topics))
@@ -137,101 +403,3 @@ class EntityProcessor:
         except Exception as e:
             logger.error(f"Error storing entities: {e}")
             raise
-            
-    def _store_entity(self, entity: Entity) -> None:
-        """
-        Store a single entity in the database.
-        
-        Args:
-            entity: The entity to store.
-        """
-        if not self.db_manager:
-            return
-            
-        # Convert entity to a dictionary for the database
-        entity_dict = entity.model_dump()
-        
-        # Check if entity exists
-        query = """
-        MERGE (e:Entity {name: $name})
-        ON CREATE SET e.entity_type = $entity_type,
-                      e.aliases = $aliases,
-                      e.description = $description,
-                      e.created_at = timestamp()
-        ON MATCH SET e.entity_type = $entity_type,
-                     e.aliases = $aliases,
-                     e.description = $description,
-                     e.updated_at = timestamp()
-        RETURN e
-        """
-        
-        parameters = {
-            "name": entity.name,
-            "entity_type": entity.entity_type,
-            "aliases": entity.aliases,
-            "description": entity.description or "",
-        }
-        
-        # Execute query
-        self.db_manager.run_query(query, parameters)
-        
-    def _store_relationship(self, relationship: Relationship) -> None:
-        """
-        Store a relationship between entities in the database.
-        
-        Args:
-            relationship: The relationship to store.
-        """
-        if not self.db_manager:
-            return
-            
-        # Create a relationship between entities
-        query = """
-        MATCH (source:Entity {name: $source})
-        MATCH (target:Entity {name: $target})
-        MERGE (source)-[r:`$relationship_type`]->(target)
-        ON CREATE SET r.description = $description,
-                      r.confidence = $confidence,
-                      r.created_at = timestamp()
-        ON MATCH SET r.description = $description,
-                     r.confidence = $confidence,
-                     r.updated_at = timestamp()
-        RETURN r
-        """
-        
-        # Replace the relationship_type placeholder
-        query = query.replace("`$relationship_type`", f"`{relationship.relationship_type}`")
-        
-        parameters = {
-            "source": relationship.source,
-            "target": relationship.target,
-            "description": relationship.description or "",
-            "confidence": relationship.confidence,
-        }
-        
-        # Execute query
-        self.db_manager.run_query(query, parameters)
-        
-    def _store_topic(self, topic: str) -> None:
-        """
-        Store a topic in the database.
-        
-        Args:
-            topic: The topic to store.
-        """
-        if not self.db_manager:
-            return
-            
-        query = """
-        MERGE (t:Topic {name: $name})
-        ON CREATE SET t.created_at = timestamp()
-        ON MATCH SET t.updated_at = timestamp()
-        RETURN t
-        """
-        
-        parameters = {
-            "name": topic
-        }
-        
-        # Execute query
-        self.db_manager.run_query(query, parameters) 
\ No newline at end of file
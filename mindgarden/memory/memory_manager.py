@@ -5,7 +5,11 @@ Memory manager for MindGarden knowledge storage and retrieval.
 import logging
 import time
 import uuid
-from typing import Dict, List, Any, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Any, Optional, Protocol, Tuple
 from datetime import datetime
 
 from mindgarden.config.settings import get_config
@@ -16,6 +20,45 @@ from mindgarden.memory.db import memory_operations
 
 logger = logging.getLogger(__name__)
 
+_CLEAR_MEMORIES_QUERY = "MATCH (m:Memory) DETACH DELETE m"
+
+# An entity with its related entities and recent memories, in one round-trip
+_ENTITY_INFORMATION_QUERY = """
+MATCH (e:Entity {name: $name})
+CALL {
+    WITH e
+    MATCH (e)-[r]-(related:Entity)
+    WITH DISTINCT related.name AS name, type(r) AS relationship_type
+    LIMIT 10
+    RETURN collect({name: name, relationship: relationship_type}) AS related_entities
+}
+CALL {
+    WITH e
+    MATCH (m:Memory)-[:MENTIONS]->(e)
+    WITH m
+    ORDER BY m.timestamp DESC
+    LIMIT 5
+    RETURN collect(m.content) AS memories
+}
+RETURN e, related_entities, memories
+"""
+
+
+class MemoryManagerProtocol(Protocol):
+    """The memory operations the agent relies on, implemented by MemoryManager."""
+
+    def retrieve_relevant(self, query: str, limit: int = 5) -> List[str]:
+        ...
+
+    def store_conversation(self, user_message: str, assistant_response: str) -> None:
+        ...
+
+    def get_entity_information(self, entity_name: str) -> Dict[str, Any]:
+        ...
+
+    def close(self) -> None:
+        ...
+
 
 class MemoryManager:
     """Memory manager for knowledge storage and retrieval."""
@@ -24,15 +67,27 @@ class MemoryManager:
         """Initialize the memory manager."""
         self.config = get_config()
         
-        # For Phase 1, we'll have dual storage - both in-memory and Neo4j
-        # In-memory storage for quick access and fallback
-        self.memories = []
+        # In-memory storage, used when Neo4j is unavailable or a write to it
+        # fails; bounded so the oldest memories are evicted in O(1) once full
+        self.memories = deque(maxlen=self.config.memory_cache_size)
+        
+        # Bumped whenever the in-memory store changes, so cached retrievals
+        # keyed on it are never served stale
+        self._version = 0
+        self._retrieve_cached = lru_cache(maxsize=128)(self._retrieve_in_memory)
         
         # Neo4j for persistent storage
         self.use_neo4j = False  # Default to False for backward compatibility
         self.db_manager = None
         self.entity_processor = None
         
+        # Entity extraction is I/O bound, so independent texts are extracted in threads
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mindgarden-extract")
+        
+        # Last formatted second, reused for memories stored within that second
+        self._last_second = None
+        self._last_formatted_time = ""
+        
         # Try to initialize Neo4j connection if configured
         try:
             self.db_manager = Neo4jManager()
@@ -45,6 +100,22 @@ class MemoryManager:
             logger.warning(f"Failed to initialize Neo4j connection: {e}")
             logger.warning("Falling back to in-memory storage only")
 
+    def _format_time(self, timestamp: float) -> str:
+        """
+        Format a timestamp to the second, reusing the last result within the same second.
+        
+        Args:
+            timestamp: Unix timestamp to format.
+            
+        Returns:
+            The timestamp formatted as 'YYYY-MM-DD HH:MM:SS'.
+        """
+        second = int(timestamp)
+        if second != self._last_second:
+            self._last_formatted_time = datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S')
+            self._last_second = second
+        return self._last_formatted_time
+
     def retrieve_relevant(self, query: str, limit: int = 5) -> List[str]:
         """
         Retrieve relevant memories based on a query.
@@ -75,18 +146,31 @@ class MemoryManager:
                 # Fall back to in-memory if Neo4j fails
         
         # Default in-memory retrieval (fallback)
-        relevant_memories = []
-        
-        if self.memories:
-            # Sort memories by timestamp (newest first)
-            sorted_memories = sorted(self.memories, key=lambda x: x.get('timestamp', 0), reverse=True)
+        if limit <= 0:
+            return []
             
-            # Take the most recent ones up to limit
-            for memory in sorted_memories[:limit]:
-                memory_text = f"{memory.get('text', '')} [From: {memory.get('source', '')}, {memory.get('date', '')}]"
-                relevant_memories.append(memory_text)
+        return list(self._retrieve_cached(limit, self._version))
+        
+    def _retrieve_in_memory(self, limit: int, version: int) -> Tuple[str, ...]:
+        """
+        Format the most recent in-memory memories, newest first.
+        
+        Results are cached per instance. The version argument is unused here
+        and only keys the cache, so a changed store is always scanned again.
         
-        return relevant_memories
+        Args:
+            limit: Maximum number of memories to retrieve.
+            version: The in-memory store version the result is valid for.
+            
+        Returns:
+            Tuple of memory strings.
+        """
+        # Memories are appended in timestamp order, so the most recent
+        # ones are at the end (newest first)
+        return tuple(
+            f"{memory.get('text', '')} [From: {memory.get('source', '')}, {memory.get('date', '')}]"
+            for memory in islice(reversed(self.memories), limit)
+        )
 
     def store_conversation(self, user_message: str, assistant_response: str) -> None:
         """
@@ -97,70 +181,50 @@ class MemoryManager:
             assistant_response: The assistant's response.
         """
         timestamp = time.time()
-        formatted_time = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Store in both storage systems for redundancy
-        
-        # 1. Store in in-memory storage
-        # Store user message
-        self.memories.append({
-            'text': user_message,
-            'source': 'user',
-            'timestamp': timestamp,
-            'date': formatted_time
-        })
+        formatted_time = self._format_time(timestamp)
         
-        # Store assistant response
-        self.memories.append({
-            'text': assistant_response,
-            'source': 'assistant',
-            'timestamp': timestamp + 0.1,  # Slightly later to preserve order
-            'date': formatted_time
-        })
+        memory_items = [
+            {
+                'text': user_message,
+                'source': 'user',
+                'timestamp': timestamp,
+                'date': formatted_time
+            },
+            {
+                'text': assistant_response,
+                'source': 'assistant',
+                'timestamp': timestamp + 0.1,  # Slightly later to preserve order
+                'date': formatted_time
+            },
+        ]
         
-        # 2. Store in Neo4j if enabled
+        # Store in Neo4j if enabled
         if self.use_neo4j:
             try:
-                # Store user message
-                user_memory_id = memory_operations.store_memory(
-                    self.db_manager,
-                    content=user_message,
-                    source='user',
-                    metadata={'timestamp': timestamp, 'date': formatted_time}
+                # Extract entities from both messages concurrently
+                texts = (user_message, assistant_response)
+                user_extracted, assistant_extracted = self.executor.map(
+                    self.entity_processor.extract_entities_from_text, texts
                 )
                 
-                # Extract entities from user message
-                extracted = self.entity_processor.extract_entities_from_text(user_message)
-                
-                # Store entities and connect to memory
-                self.entity_processor.store_entities(extracted)
-                
-                # Connect memory to entities and topics
-                entity_names = [entity.name for entity in extracted.entities]
-                memory_operations.connect_memory_to_entities(self.db_manager, user_memory_id, entity_names)
-                memory_operations.connect_memory_to_topics(self.db_manager, user_memory_id, extracted.topics)
-                
-                # Store assistant response
-                assistant_memory_id = memory_operations.store_memory(
+                # Store both messages, their entities and topics in one transaction
+                memory_operations.store_memories_with_graph(
                     self.db_manager,
-                    content=assistant_response,
-                    source='assistant',
-                    metadata={'timestamp': timestamp + 0.1, 'date': formatted_time}
+                    [
+                        (user_message, 'user', {'timestamp': timestamp, 'date': formatted_time}, user_extracted),
+                        (assistant_response, 'assistant', {'timestamp': timestamp + 0.1, 'date': formatted_time}, assistant_extracted),
+                    ]
                 )
                 
-                # Extract entities from assistant response
-                extracted = self.entity_processor.extract_entities_from_text(assistant_response)
-                
-                # Store entities and connect to memory
-                self.entity_processor.store_entities(extracted)
-                
-                # Connect memory to entities and topics
-                entity_names = [entity.name for entity in extracted.entities]
-                memory_operations.connect_memory_to_entities(self.db_manager, assistant_memory_id, entity_names)
-                memory_operations.connect_memory_to_topics(self.db_manager, assistant_memory_id, extracted.topics)
-                
             except Exception as e:
                 logger.error(f"Error storing conversation in Neo4j: {e}")
+                # Keep the exchange in memory so it can still be retrieved
+                self.memories.extend(memory_items)
+                self._version += 1
+        else:
+            # Without Neo4j, in-memory storage is the only store
+            self.memories.extend(memory_items)
+            self._version += 1
         
         logger.debug(f"Stored conversation exchange at {formatted_time}")
 
@@ -174,9 +238,8 @@ class MemoryManager:
             metadata: Additional metadata for the document.
         """
         timestamp = time.time()
-        formatted_time = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        formatted_time = self._format_time(timestamp)
         
-        # 1. Store in in-memory storage
         memory_item = {
             'text': content,
             'source': source,
@@ -187,13 +250,16 @@ class MemoryManager:
         if metadata:
             memory_item.update(metadata)
             
-        self.memories.append(memory_item)
-        
-        # 2. Store in Neo4j if enabled
+        # Store in Neo4j if enabled
         if self.use_neo4j:
             try:
-                # Store document as memory
-                memory_id = memory_operations.store_memory(
+                # Extract entities from document, with its blocks extracted concurrently
+                extracted = self.entity_processor.extract_entities_from_document(
+                    content, executor=self.executor
+                )
+                
+                # Store document as memory with its entities and topics in one transaction
+                memory_operations.store_memory_with_graph(
                     self.db_manager,
                     content=content,
                     source=source,
@@ -201,42 +267,46 @@ class MemoryManager:
                         'timestamp': timestamp, 
                         'date': formatted_time,
                         **(metadata or {})
-                    }
+                    },
+                    extracted=extracted
                 )
                 
-                # Extract entities from document
-                extracted = self.entity_processor.extract_entities_from_text(content)
-                
-                # Store entities and connect to memory
-                self.entity_processor.store_entities(extracted)
-                
-                # Connect memory to entities and topics
-                entity_names = [entity.name for entity in extracted.entities]
-                memory_operations.connect_memory_to_entities(self.db_manager, memory_id, entity_names)
-                memory_operations.connect_memory_to_topics(self.db_manager, memory_id, extracted.topics)
-                
             except Exception as e:
                 logger.error(f"Error storing document in Neo4j: {e}")
+                # Keep the document in memory so it can still be retrieved
+                self.memories.append(memory_item)
+                self._version += 1
+        else:
+            # Without Neo4j, in-memory storage is the only store
+            self.memories.append(memory_item)
+            self._version += 1
         
         logger.debug(f"Stored document from {source} at {formatted_time}")
 
     def clear_memory(self) -> None:
         """Clear all memories."""
         # Clear in-memory storage
-        self.memories = []
+        self.memories.clear()
+        self._version += 1
         
         # Clear Neo4j if enabled
         if self.use_neo4j:
             try:
                 # Warning: This deletes all memories - use with caution!
-                query = "MATCH (m:Memory) DETACH DELETE m"
-                self.db_manager.run_query(query)
+                self.db_manager.run_query(_CLEAR_MEMORIES_QUERY)
+                self.db_manager.reset_memory_index()
                 logger.info("Cleared all memories from Neo4j")
             except Exception as e:
                 logger.error(f"Error clearing memories from Neo4j: {e}")
         
         logger.debug("Cleared all memories")
         
+    def close(self) -> None:
+        """Wait for running extractions, then flush the similarity index and release the Neo4j connection."""
+        self.executor.shutdown(wait=True)
+        if self.db_manager is not None:
+            self.db_manager.close()
+            
     def get_entity_information(self, entity_name: str) -> Dict[str, Any]:
         """
         Get information about a specific entity.
@@ -251,45 +321,18 @@ class MemoryManager:
             return {"name": entity_name, "error": "Neo4j integration not enabled"}
             
         try:
-            # Get entity information
-            query = """
-            MATCH (e:Entity {name: $name})
-            RETURN e
-            """
-            
             parameters = {
                 "name": entity_name
             }
             
-            results = self.db_manager.run_query(query, parameters)
+            results = self.db_manager.run_query(_ENTITY_INFORMATION_QUERY, parameters)
             
             if not results:
                 return {"name": entity_name, "found": False}
                 
             entity_data = results[0].get('e', {})
-            
-            # Get related memories
-            memories = memory_operations.retrieve_memories_by_entity(
-                self.db_manager, 
-                entity_name=entity_name,
-                limit=5
-            )
-            
-            # Get related entities
-            related_query = """
-            MATCH (e:Entity {name: $name})-[r]->(related:Entity)
-            RETURN related.name as name, type(r) as relationship_type
-            UNION
-            MATCH (related:Entity)-[r]->(e:Entity {name: $name})
-            RETURN related.name as name, type(r) as relationship_type
-            LIMIT 10
-            """
-            
-            related_results = self.db_manager.run_query(related_query, parameters)
-            related_entities = [
-                {"name": record.get('name'), "relationship": record.get('relationship_type')}
-                for record in related_results
-            ]
+            related_entities = results[0].get('related_entities', [])
+            memories = results[0].get('memories', [])
             
             return {
                 "name": entity_name,
@@ -298,7 +341,7 @@ class MemoryManager:
                 "aliases": entity_data.get('aliases', []),
                 "description": entity_data.get('description', ""),
                 "related_entities": related_entities,
-                "memories": [memory.content for memory in memories]
+                "memories": memories
             }
             
         except Exception as e:
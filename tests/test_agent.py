@@ -3,116 +3,244 @@ Tests for the Quinn agent.
 """
 
 import pytest
-from unittest.mock import MagicMock, patch, AsyncMock
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
 import asyncio
 
+from mindgarden.agent import agent as agent_mod
 from mindgarden.agent.agent import Agent
 
+# Keep this module on one worker when run in parallel with pytest-xdist
+pytestmark = pytest.mark.xdist_group(name="agent")
 
-@pytest.fixture
-def mock_openai_client():
-    """Fixture for mocking OpenAI client."""
-    with patch("mindgarden.agent.agent.OpenAI") as mock_openai:
-        # Create a mock OpenAI client
-        mock_client = MagicMock()
-        mock_openai.return_value = mock_client
-        yield mock_client
-
-
-@pytest.fixture
-def mock_agent():
-    """Fixture for mocking Agent SDK."""
-    with patch("mindgarden.agent.agent.AsyncAgent") as mock_agent_class:
-        # Create mock agent and run
-        mock_agent = MagicMock()
-        mock_run = AsyncMock()
-        mock_response = MagicMock()
-        
-        # Content setup with Pydantic model-like structure
-        mock_content = MagicMock()
-        mock_content.text = "This is a test response from Quinn."
-        mock_response.content = [mock_content]
-        
-        # Set up the async methods
-        mock_run.submit_message = AsyncMock(return_value=mock_response)
-        mock_agent.create_run = AsyncMock(return_value=mock_run)
-        
-        # Return the mock agent instance when AsyncAgent is instantiated
-        mock_agent_class.return_value = mock_agent
-        
-        yield mock_agent
-
-
-@pytest.fixture
-def mock_memory_manager():
-    """Fixture for mocking MemoryManager."""
-    with patch("mindgarden.agent.agent.MemoryManager") as mock_memory_manager_class:
-        # Create a mock memory manager
-        mock_manager = MagicMock()
-        mock_memory_manager_class.return_value = mock_manager
-        
-        # Mock memory retrieval
-        mock_manager.retrieve_relevant.return_value = [
-            "Previous memory 1",
-            "Previous memory 2"
-        ]
-        
-        yield mock_manager
+# The response never changes, so every fake run returns this same object
+_FIXED_RESPONSE = SimpleNamespace(content=[SimpleNamespace(text="This is a test response from Quinn.")])
+
+
+def _text_chunk(text):
+    """Build a streamed chunk carrying a text delta."""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None))])
+
+
+def _tool_call_chunk(index, call_id, name, arguments):
+    """Build a streamed chunk carrying a fragment of a tool call."""
+    call = SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[call]))])
+
+
+class FakeCompletions:
+    """Stand-in for the chat completions API that streams canned chunks, one list per request."""
+
+    def __init__(self):
+        self.responses = []
+        self.calls = []
+
+    async def create(self, **kwargs):
+        # Copy the messages, which the agent extends between requests
+        self.calls.append({**kwargs, "messages": list(kwargs["messages"])})
+        chunks = self.responses.pop(0)
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+
+class FakeAsyncOpenAI:
+    """Stand-in for the AsyncOpenAI client."""
+
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=FakeCompletions())
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeRun:
+    """Stand-in for an agent run that answers with a fixed response."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def submit_message(self, message):
+        self.calls.append(message)
+        return _FIXED_RESPONSE
+
+
+class FakeAsyncAgent:
+    """Stand-in for the Agent SDK's AsyncAgent."""
+
+    def __init__(self, **kwargs):
+        self.runs = []
+        self.loops = []
+
+    async def create_run(self):
+        self.loops.append(asyncio.get_running_loop())
+        run = FakeRun()
+        self.runs.append(run)
+        return run
+
+
+class _StubMemoryManager:
+    """Plain MemoryManagerProtocol implementation that records queries and stored exchanges."""
+
+    def __init__(self):
+        self.queries: List[str] = []
+        self.stored: List[Tuple[str, str]] = []
+        self.closed = False
+
+    def retrieve_relevant(self, query: str, limit: int = 5) -> List[str]:
+        self.queries.append(query)
+        return ["Previous memory 1", "Previous memory 2"]
+
+    def store_conversation(self, user_message: str, assistant_response: str) -> None:
+        self.stored.append((user_message, assistant_response))
+
+    def get_entity_information(self, entity_name: str) -> Dict[str, Any]:
+        return {"name": entity_name, "found": False}
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture(scope="module", autouse=True)
+def fake_dependencies():
+    """Install the fakes in place of the agent's dependencies for the whole module."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(agent_mod, "AsyncOpenAI", FakeAsyncOpenAI)
+        mp.setattr(agent_mod, "AsyncAgent", FakeAsyncAgent)
+        mp.setattr(agent_mod, "MemoryManager", _StubMemoryManager)
+        yield
 
 
 def test_agent_initialization():
     """Test agent initialization."""
-    with patch("mindgarden.agent.agent.OpenAI"), \
-         patch("mindgarden.agent.agent.AsyncAgent"), \
-         patch("mindgarden.agent.agent.MemoryManager"):
-        agent = Agent()
-        assert agent is not None
-        assert agent.conversation_history == []
-        assert agent.state == {"conversation": []}
+    agent = Agent()
+    assert agent is not None
+    assert list(agent.conversation_history) == []
+    assert agent.state == {"conversation": []}
 
 
-@pytest.mark.asyncio
-async def test_process_message_async(mock_agent, mock_memory_manager):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_process_message_async():
     """Test async processing of a message."""
-    with patch("mindgarden.agent.agent.AsyncAgent", return_value=mock_agent):
-        agent = Agent()
-        
-        # Process a test message asynchronously
-        response = await agent._process_message_async("Hello, Quinn!")
-        
-        # Check the response
-        assert response == "This is a test response from Quinn."
-        
-        # Verify conversation history was updated
-        assert len(agent.conversation_history) == 2
-        assert agent.conversation_history[0]["role"] == "user"
-        assert agent.conversation_history[0]["content"] == "Hello, Quinn!"
-        assert agent.conversation_history[1]["role"] == "assistant"
-        assert agent.conversation_history[1]["content"] == "This is a test response from Quinn."
-        
-        # Verify memory manager was used
-        mock_memory_manager.retrieve_relevant.assert_called_once_with("Hello, Quinn!")
-        mock_memory_manager.store_conversation.assert_called_once_with(
-            "Hello, Quinn!", "This is a test response from Quinn."
-        )
-        
-        # Verify agent run was created and message submitted
-        mock_agent.create_run.assert_called_once()
-        mock_agent.create_run.return_value.submit_message.assert_called_once_with("Hello, Quinn!")
-
-
-def test_process_message(mock_agent, mock_memory_manager):
+    agent = Agent()
+
+    # Process a test message asynchronously
+    response = await agent._process_message_async("Hello, Quinn!")
+
+    # Check the response
+    assert response == "This is a test response from Quinn."
+
+    # Verify conversation history was updated
+    assert len(agent.conversation_history) == 2
+    assert agent.conversation_history[0]["role"] == "user"
+    assert agent.conversation_history[0]["content"] == "Hello, Quinn!"
+    assert agent.conversation_history[1]["role"] == "assistant"
+    assert agent.conversation_history[1]["content"] == "This is a test response from Quinn."
+
+    # Verify memory manager was used
+    assert agent.memory_manager.queries == ["Hello, Quinn!"]
+    assert agent.memory_manager.stored == [
+        ("Hello, Quinn!", "This is a test response from Quinn.")
+    ]
+
+    # Verify agent run was created and message submitted
+    assert len(agent.async_agent.runs) == 1
+    assert agent.async_agent.runs[0].calls == ["Hello, Quinn!"]
+
+
+def test_process_message():
     """Test synchronous wrapper for processing a message."""
-    with patch("mindgarden.agent.agent.AsyncAgent", return_value=mock_agent), \
-         patch("mindgarden.agent.agent.asyncio.run") as mock_run:
-        agent = Agent()
-        
-        # Mock the async run result
-        mock_run.return_value = "This is a test response from Quinn."
-        
-        # Process a test message
-        response = agent.process_message("Hello, Quinn!")
-        
-        # Check that asyncio.run was called with the async method
-        mock_run.assert_called_once()
-        assert response == "This is a test response from Quinn." 
\ No newline at end of file
+    agent = Agent()
+
+    # Process two messages, as a synchronous caller would
+    first = agent.process_message("Hello, Quinn!")
+    second = agent.process_message("How are you?")
+
+    # Check the responses came back through the fake agent runs
+    assert first == second == "This is a test response from Quinn."
+    assert [run.calls for run in agent.async_agent.runs] == [["Hello, Quinn!"], ["How are you?"]]
+
+    # Both calls ran on the agent's own loop, which close() shuts down
+    loop, again = agent.async_agent.loops
+    assert loop is again
+    agent.close()
+    assert loop.is_closed()
+    assert agent._loop is None
+    assert agent.memory_manager.closed
+
+
+def test_close_without_process_message():
+    """Test that close() releases the client and memory manager when process_message never ran."""
+    agent = Agent()
+
+    agent.close()
+
+    assert agent.client.closed
+    assert agent.memory_manager.closed
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stream_message():
+    """Test streaming a response to a message."""
+    agent = Agent()
+    agent.client.chat.completions.responses = [
+        [_text_chunk(text) for text in ["This is a test ", "response ", None, "from Quinn."]]
+    ]
+
+    # Stream a test message
+    deltas = [delta async for delta in agent.stream_message("Hello, Quinn!")]
+
+    # Check the streamed response, skipping empty deltas
+    assert deltas == ["This is a test ", "response ", "from Quinn."]
+
+    # Verify the full reply was recorded once the stream ended
+    assert len(agent.conversation_history) == 2
+    assert agent.conversation_history[1]["content"] == "This is a test response from Quinn."
+    assert agent.memory_manager.stored == [
+        ("Hello, Quinn!", "This is a test response from Quinn.")
+    ]
+
+    # Verify the completion was requested as a stream
+    assert agent.client.chat.completions.calls[0]["stream"] is True
+    assert [tool["function"]["name"] for tool in agent.client.chat.completions.calls[0]["tools"]] == [
+        "memory_search",
+        "entity_lookup",
+    ]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stream_message_with_tool_call():
+    """Test that streamed tool calls are run and the reply after them is streamed."""
+    agent = Agent()
+    completions = agent.client.chat.completions
+    completions.responses = [
+        # The tool call arrives split across chunks
+        [
+            _tool_call_chunk(0, "call_1", "memory_search", '{"query": "gar'),
+            _tool_call_chunk(0, None, None, 'den"}'),
+        ],
+        [_text_chunk("You like "), _text_chunk("gardening.")],
+    ]
+
+    deltas = [delta async for delta in agent.stream_message("What do I like?")]
+
+    # Only the reply after the tool call is streamed and stored
+    assert deltas == ["You like ", "gardening."]
+    assert agent.memory_manager.stored == [("What do I like?", "You like gardening.")]
+
+    # The tool ran with the reassembled arguments
+    assert agent.memory_manager.queries == ["What do I like?", "garden"]
+
+    # The follow-up request carried the tool call and its result
+    assert len(completions.calls) == 2
+    tool_request, tool_result = completions.calls[1]["messages"][-2:]
+    assert tool_request["tool_calls"] == [
+        {"id": "call_1", "type": "function", "function": {"name": "memory_search", "arguments": '{"query": "garden"}'}}
+    ]
+    assert tool_result["role"] == "tool"
+    assert tool_result["tool_call_id"] == "call_1"
+    assert "Previous memory 1" in tool_result["content"]
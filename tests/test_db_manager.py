@@ -0,0 +1,298 @@
+"""
+Tests for the Neo4j database manager.
+"""
+
+import pytest
+from openai import BadRequestError
+from types import SimpleNamespace
+
+from mindgarden.memory import embeddings
+from mindgarden.memory.db import db_manager as db_manager_module
+from mindgarden.memory.db.db_manager import Neo4jManager
+from mindgarden.memory.embedding_cache import EmbeddingCache
+from mindgarden.memory.embedding_store import EmbeddingStore
+
+
+class FakeNeo4j:
+    """Stand-in for run_query that answers the similarity index queries from a dict of memories."""
+
+    def __init__(self, memories):
+        self.memories = memories
+        self.queries = []
+
+    def run_query(self, query, parameters=None):
+        self.queries.append((query, parameters))
+        if query == "MATCH (m:Memory) RETURN m.id AS id":
+            return [{"id": memory_id} for memory_id in self.memories]
+        if query == db_manager_module._SET_EMBEDDINGS_QUERY:
+            for row in parameters["rows"]:
+                self.memories[row["id"]]["embedding"] = row["embedding"]
+            return []
+        return [
+            {"id": memory_id, **self.memories[memory_id]}
+            for memory_id in parameters["ids"]
+        ]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Fixture for a Neo4jManager with a temporary similarity index and no connection."""
+    manager = Neo4jManager(password="test")
+    manager.embedding_store = EmbeddingStore(path=tmp_path / "embeddings.i8", dim=2)
+    return manager
+
+
+def test_load_memory_index_backfills_missing(manager, monkeypatch):
+    """Test that memories missing from the index are added, embedding those stored without one."""
+    neo4j = FakeNeo4j({
+        "a": {"embedding": [1.0, 0.0], "content": "indexed"},
+        "b": {"embedding": [0.0, 1.0], "content": "not indexed"},
+        "c": {"embedding": None, "content": "never embedded"},
+    })
+    monkeypatch.setattr(manager, "run_query", neo4j.run_query)
+    embedded = []
+    monkeypatch.setattr(
+        db_manager_module.embeddings, "embed_texts",
+        lambda texts: embedded.extend(texts) or [[0.6, 0.8] for _ in texts],
+    )
+    manager.embedding_store.append("a", [1.0, 0.0])
+
+    manager.load_memory_index()
+
+    # Only the memories missing from the index were loaded
+    assert neo4j.queries[1][1] == {"ids": ["b", "c"]}
+    assert manager.embedding_store.ids == ["a", "b", "c"]
+
+    # The memory without an embedding was embedded and the embedding saved in Neo4j
+    assert embedded == ["never embedded"]
+    assert neo4j.memories["c"]["embedding"] == [0.6, 0.8]
+
+
+def test_load_memory_index_skips_blank_and_failed_batches(manager, monkeypatch):
+    """Test that blank memories are never sent, and a failed batch does not stop later ones."""
+    neo4j = FakeNeo4j({
+        "blank": {"embedding": None, "content": "  "},
+        "empty": {"embedding": None, "content": None},
+        "bad": {"embedding": None, "content": "rejected"},
+        "good": {"embedding": None, "content": "accepted"},
+    })
+    monkeypatch.setattr(manager, "run_query", neo4j.run_query)
+    monkeypatch.setattr(db_manager_module, "_BACKFILL_BATCH_SIZE", 1)
+    requests = []
+
+    def embed_texts(texts):
+        requests.append(texts)
+        if texts == ["rejected"]:
+            raise RuntimeError("API rejected the batch")
+        return [[0.6, 0.8] for _ in texts]
+
+    monkeypatch.setattr(db_manager_module.embeddings, "embed_texts", embed_texts)
+
+    manager.load_memory_index()
+
+    assert requests == [["rejected"], ["accepted"]]
+    assert manager.embedding_store.ids == ["good"]
+    assert neo4j.memories["good"]["embedding"] == [0.6, 0.8]
+
+
+def test_load_memory_index_keeps_batch_with_rejected_memory(manager, monkeypatch, tmp_path):
+    """Test that a memory the embeddings API rejects does not keep the rest of its batch out of the index."""
+    neo4j = FakeNeo4j({
+        "first": {"embedding": None, "content": "fits"},
+        "huge": {"embedding": None, "content": "too long " * 100},
+        "last": {"embedding": None, "content": "also fits"},
+    })
+    monkeypatch.setattr(manager, "run_query", neo4j.run_query)
+    requests = []
+
+    def create(model, input):
+        requests.append(input)
+        if any(len(text) > 100 for text in input):
+            raise BadRequestError(
+                "Input is longer than the maximum context length",
+                response=SimpleNamespace(request=None, status_code=400, headers={}),
+                body=None,
+            )
+        return SimpleNamespace(data=[SimpleNamespace(index=index, embedding=[3.0, 4.0]) for index in range(len(input))])
+
+    cache = EmbeddingCache(directory=tmp_path / "cache", model="test-model")
+    monkeypatch.setattr(embeddings, "_get_cache", lambda: cache)
+    monkeypatch.setattr(embeddings, "get_openai_client", lambda: SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+
+    manager.load_memory_index()
+    cache.close()
+
+    # The whole batch went in one request, then the rejected memory was singled out
+    assert len(requests[0]) == 3
+    assert sorted(manager.embedding_store.ids) == ["first", "last"]
+    assert neo4j.memories["huge"]["embedding"] is None
+
+
+def test_load_memory_index_caps_batch_size(manager, monkeypatch):
+    """Test that backfill batches are capped by content size as well as count."""
+    neo4j = FakeNeo4j({
+        memory_id: {"embedding": None, "content": "x" * 6}
+        for memory_id in ["a", "b", "c"]
+    })
+    monkeypatch.setattr(manager, "run_query", neo4j.run_query)
+    monkeypatch.setattr(db_manager_module, "_BACKFILL_BATCH_CHARS", 12)
+    requests = []
+    monkeypatch.setattr(
+        db_manager_module.embeddings, "embed_texts",
+        lambda texts: requests.append(texts) or [[0.6, 0.8] for _ in texts],
+    )
+
+    manager.load_memory_index()
+
+    assert [len(texts) for texts in requests] == [2, 1]
+    assert manager.embedding_store.ids == ["a", "b", "c"]
+
+
+def test_load_memory_index_up_to_date(manager, monkeypatch):
+    """Test that an index holding every memory is left as it is."""
+    neo4j = FakeNeo4j({"a": {"embedding": [1.0, 0.0], "content": "indexed"}})
+    monkeypatch.setattr(manager, "run_query", neo4j.run_query)
+    manager.embedding_store.append("a", [1.0, 0.0])
+
+    manager.load_memory_index()
+
+    assert len(neo4j.queries) == 1
+    assert manager.embedding_store.ids == ["a"]
+
+
+def test_load_memory_index_embedding_failure(manager, monkeypatch):
+    """Test that memories which cannot be embedded are left for a later start."""
+    neo4j = FakeNeo4j({"c": {"embedding": None, "content": "never embedded"}})
+    monkeypatch.setattr(manager, "run_query", neo4j.run_query)
+
+    def fail(texts):
+        raise RuntimeError("API unavailable")
+
+    monkeypatch.setattr(db_manager_module.embeddings, "embed_texts", fail)
+
+    manager.load_memory_index()
+
+    assert manager.embedding_store.ids == []
+    assert neo4j.memories["c"]["embedding"] is None
+
+
+def test_load_memory_index_save_failure(manager, monkeypatch):
+    """Test that a batch whose embeddings cannot be saved is skipped without stopping later ones."""
+    neo4j = FakeNeo4j({
+        "bad": {"embedding": None, "content": "not saved"},
+        "good": {"embedding": None, "content": "saved"},
+    })
+    monkeypatch.setattr(db_manager_module, "_BACKFILL_BATCH_SIZE", 1)
+    monkeypatch.setattr(db_manager_module.embeddings, "embed_texts", lambda texts: [[0.6, 0.8] for _ in texts])
+
+    def run_query(query, parameters=None):
+        if query == db_manager_module._SET_EMBEDDINGS_QUERY and parameters["rows"][0]["id"] == "bad":
+            raise RuntimeError("write failed")
+        return neo4j.run_query(query, parameters)
+
+    monkeypatch.setattr(manager, "run_query", run_query)
+
+    manager.load_memory_index()
+
+    assert manager.embedding_store.ids == ["good"]
+    assert neo4j.memories["bad"]["embedding"] is None
+    assert neo4j.memories["good"]["embedding"] == [0.6, 0.8]
+
+
+def test_run_query_failure_logs_parameter_outline(manager, monkeypatch, caplog):
+    """Test that a failed query logs a truncated outline of large parameters."""
+    class FailingSession:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def run(self, query, parameters):
+            raise RuntimeError("write failed")
+
+    monkeypatch.setattr(manager, "get_session", FailingSession)
+    rows = [{"id": str(index), "embedding": [0.5] * 1536} for index in range(256)]
+
+    with pytest.raises(RuntimeError):
+        manager.run_query(db_manager_module._SET_EMBEDDINGS_QUERY, {"rows": rows})
+
+    assert "Parameters: {'rows': [" in caplog.text
+    assert len(caplog.text) < 1000
+
+
+class FakeDriver:
+    """Stand-in for a Neo4j driver that records whether it was closed."""
+
+    def __init__(self, uri, auth, **kwargs):
+        self.auth = auth
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_driver(monkeypatch):
+    """Create fake drivers instead of connecting to Neo4j."""
+    monkeypatch.setattr(db_manager_module.GraphDatabase, "driver", FakeDriver)
+
+
+def test_shared_driver_outlives_other_managers(fake_driver):
+    """Test that closing one manager leaves the driver it shares with another open."""
+    first = Neo4jManager(uri="bolt://test", user="neo4j", password="secret")
+    second = Neo4jManager(uri="bolt://test", user="neo4j", password="secret")
+    first.connect()
+    first.connect()
+    second.connect()
+    driver = first.driver
+    assert second.driver is driver
+
+    first.close()
+    assert first.driver is None
+    assert not driver.closed
+    assert second.driver is driver
+
+    second.close()
+    assert driver.closed
+    assert second.driver is None
+
+
+def test_drivers_are_per_password(fake_driver):
+    """Test that managers with different passwords do not share a driver."""
+    first = Neo4jManager(uri="bolt://test", user="neo4j", password="secret")
+    second = Neo4jManager(uri="bolt://test", user="neo4j", password="other")
+    first.connect()
+    second.connect()
+
+    assert first.driver is not second.driver
+    assert second.driver.auth == ("neo4j", "other")
+
+    first.close()
+    second.close()
+
+
+def test_embedding_store_per_server(tmp_path, monkeypatch):
+    """Test that managers share the store of their server and never that of another server."""
+    config = db_manager_module.get_config().model_copy(update={"data_dir": tmp_path})
+    monkeypatch.setattr(db_manager_module, "get_config", lambda: config)
+    first = Neo4jManager(uri="bolt://one", password="secret")
+    second = Neo4jManager(uri="bolt://one", password="secret")
+    other = Neo4jManager(uri="bolt://two", password="secret")
+
+    assert first.get_embedding_store() is second.get_embedding_store()
+    assert other.get_embedding_store() is not first.get_embedding_store()
+    assert other.get_embedding_store().path.parent == tmp_path
+
+
+def test_embedding_store_per_model(tmp_path, monkeypatch):
+    """Test that changing the embedding model or dimension opens a separate store."""
+    config = db_manager_module.get_config().model_copy(update={"data_dir": tmp_path})
+    monkeypatch.setattr(db_manager_module, "get_config", lambda: config)
+    first = Neo4jManager(uri="bolt://one", password="secret").get_embedding_store()
+
+    config = config.model_copy(update={"embedding_model": "text-embedding-3-large", "embedding_dim": 3072})
+    other = Neo4jManager(uri="bolt://one", password="secret").get_embedding_store()
+
+    assert other is not first
+    assert other.dim == 3072
@@ -0,0 +1,55 @@
+"""
+Tests for the embedding cache.
+"""
+
+import pytest
+
+from mindgarden.memory.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def embedding_cache(tmp_path):
+    """Fixture for an EmbeddingCache in a temporary directory."""
+    cache = EmbeddingCache(directory=tmp_path, model="test-model")
+    yield cache
+    cache.close()
+
+
+def test_exact_hit(embedding_cache):
+    """Test that stored content is returned unchanged."""
+    embedding_cache.set("Hello, Quinn!", [0.5, 0.25, 0.125])
+
+    assert embedding_cache.get("Hello, Quinn!") == [0.5, 0.25, 0.125]
+    assert embedding_cache.get("Goodbye, Quinn!") is None
+
+
+def test_near_duplicate_hit(embedding_cache):
+    """Test that case and whitespace variants, and punctuated acknowledgements, share an embedding."""
+    embedding_cache.set("Thanks!", [1.0, 0.0])
+    embedding_cache.set("Hello Quinn", [0.0, 1.0])
+
+    assert embedding_cache.get("  thanks ") == [1.0, 0.0]
+    assert embedding_cache.get("THANKS.") == [1.0, 0.0]
+    assert embedding_cache.get("hello   QUINN") == [0.0, 1.0]
+
+
+def test_punctuation_keeps_texts_apart(embedding_cache):
+    """Test that texts differing in meaningful punctuation do not share an embedding."""
+    embedding_cache.set("C++", [1.0, 0.0])
+    embedding_cache.set("-5", [0.0, 1.0])
+
+    assert embedding_cache.get("c++") == [1.0, 0.0]
+    assert embedding_cache.get("C#") is None
+    assert embedding_cache.get("C") is None
+    assert embedding_cache.get("5") is None
+
+
+def test_model_change_invalidates(tmp_path, embedding_cache):
+    """Test that embeddings are not shared across models."""
+    embedding_cache.set("Hello, Quinn!", [1.0, 0.0])
+
+    other = EmbeddingCache(directory=tmp_path, model="other-model")
+    try:
+        assert other.get("Hello, Quinn!") is None
+    finally:
+        other.close()
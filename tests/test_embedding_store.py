@@ -0,0 +1,135 @@
+"""
+Tests for the embedding store.
+"""
+
+import numpy as np
+import pytest
+
+from mindgarden.memory.embedding_store import EmbeddingStore, quantize, shared_store
+
+
+def _unit(*values):
+    """Build a normalized vector."""
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    """Fixture for the matrix file path of a temporary store."""
+    return tmp_path / "embeddings.i8"
+
+
+def test_search_orders_by_similarity(store_path):
+    """Test that search returns the closest embeddings first."""
+    store = EmbeddingStore(path=store_path, dim=3)
+    store.append("x", _unit(1, 0, 0))
+    store.append("y", _unit(0, 1, 0))
+    store.append("xy", _unit(1, 1, 0))
+
+    results = store.search(_unit(1, 0.1, 0), limit=2)
+
+    assert [memory_id for memory_id, _ in results] == ["x", "xy"]
+    assert results[0][1] == pytest.approx(0.995, abs=1e-2)
+
+
+def test_persists_across_reopen(store_path):
+    """Test that embeddings are still there after reopening the store."""
+    store = EmbeddingStore(path=store_path, dim=3)
+    store.extend(["x", "y"], [_unit(1, 0, 0), _unit(0, 1, 0)])
+    store.flush()
+
+    reopened = EmbeddingStore(path=store_path, dim=3)
+
+    assert len(reopened) == 2
+    assert reopened.search(_unit(0, 1, 0), limit=1)[0][0] == "y"
+
+
+def test_grows_past_chunk(store_path):
+    """Test that the matrix file grows in whole chunks when it is full."""
+    store = EmbeddingStore(path=store_path, dim=3, chunk_rows=2)
+    for i in range(5):
+        store.append(f"m{i}", _unit(1, i, 0))
+
+    assert len(store) == 5
+    assert store_path.stat().st_size == 6 * 3
+    assert store.search(_unit(1, 4, 0), limit=1)[0][0] == "m4"
+
+
+def test_clear(store_path):
+    """Test clearing the store."""
+    store = EmbeddingStore(path=store_path, dim=3)
+    store.append("x", _unit(1, 0, 0))
+
+    store.clear()
+
+    assert len(store) == 0
+    assert store.search(_unit(1, 0, 0), limit=5) == []
+    assert len(EmbeddingStore(path=store_path, dim=3)) == 0
+
+
+def test_quantize_preserves_similarity():
+    """Test that int8 quantization barely changes cosine similarity."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2, 1536)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors[1] = vectors[0] + 0.5 * vectors[1]
+
+    quantized = quantize(vectors).astype(np.float32)
+
+    def cosine(a, b):
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    assert cosine(*quantized) == pytest.approx(cosine(*vectors), abs=0.01)
+
+
+def test_shared_store_keeps_rows_apart(store_path):
+    """Test that users of one file share a store, so their appends land in separate rows."""
+    a = shared_store(store_path, dim=3)
+    b = shared_store(store_path, dim=3)
+    a.append("x", _unit(1, 0, 0))
+    b.append("y", _unit(0, 1, 0))
+
+    assert a is b
+    reopened = EmbeddingStore(path=store_path, dim=3)
+    assert reopened.ids == ["x", "y"]
+    assert reopened.search(_unit(1, 0, 0), limit=1) == [("x", pytest.approx(1.0, abs=1e-3))]
+
+
+def test_separate_instances_keep_rows_apart(store_path):
+    """Test that stores opened separately on one file, as by two processes, append after each other's rows."""
+    a = EmbeddingStore(path=store_path, dim=3)
+    b = EmbeddingStore(path=store_path, dim=3)
+    a.append("x", _unit(1, 0, 0))
+    b.append("y", _unit(0, 1, 0))
+    a.append("z", _unit(0, 0, 1))
+
+    reopened = EmbeddingStore(path=store_path, dim=3)
+    assert reopened.ids == ["x", "y", "z"]
+    assert [reopened.search(_unit(*axis), limit=1)[0][0] for axis in [(1, 0, 0), (0, 1, 0), (0, 0, 1)]] == ["x", "y", "z"]
+
+
+def test_reader_sees_other_instance_writes(store_path):
+    """Test that a store which never appends sees rows appended and cleared through another instance."""
+    reader = EmbeddingStore(path=store_path, dim=3)
+    writer = EmbeddingStore(path=store_path, dim=3)
+    writer.append("x", _unit(1, 0, 0))
+
+    assert reader.search(_unit(1, 0, 0), limit=1) == [("x", pytest.approx(1.0, abs=1e-3))]
+
+    # After a clear the rows are rewritten, so the reader must not keep its old IDs
+    writer.clear()
+    writer.append("p", _unit(0, 1, 0))
+
+    assert reader.search(_unit(0, 1, 0), limit=5) == [("p", pytest.approx(1.0, abs=1e-3))]
+    assert reader.ids == ["p"]
+
+
+def test_reader_remaps_grown_matrix(store_path):
+    """Test that a store picks up rows past its mapping after another instance grew the file."""
+    reader = EmbeddingStore(path=store_path, dim=3, chunk_rows=2)
+    writer = EmbeddingStore(path=store_path, dim=3, chunk_rows=2)
+    writer.extend([f"m{i}" for i in range(5)], [_unit(1, i, 0) for i in range(5)])
+
+    assert reader.search(_unit(1, 4, 0), limit=1)[0][0] == "m4"
+    assert len(reader.matrix) == 6
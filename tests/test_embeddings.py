@@ -0,0 +1,83 @@
+"""
+Tests for the embedding utilities.
+"""
+
+import pytest
+from openai import BadRequestError
+from types import SimpleNamespace
+
+from mindgarden.memory import embeddings
+from mindgarden.memory.embedding_cache import EmbeddingCache
+
+
+class FakeEmbeddingsAPI:
+    """Stand-in for the embeddings API that rejects blank and over-long inputs, as the real one does."""
+
+    def __init__(self, max_chars=None):
+        self.inputs = []
+        self.max_chars = max_chars
+
+    def create(self, model, input):
+        self.inputs.append(input)
+        if any(not text.strip() for text in input):
+            raise ValueError("Input cannot be blank")
+        if self.max_chars is not None and any(len(text) > self.max_chars for text in input):
+            raise BadRequestError(
+                "Input is longer than the maximum context length",
+                response=SimpleNamespace(request=None, status_code=400, headers={}),
+                body=None,
+            )
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=index, embedding=[3.0, 4.0]) for index in range(len(input))
+        ])
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Fixture for a fake embeddings API behind a temporary embedding cache."""
+    cache = EmbeddingCache(directory=tmp_path, model="test-model")
+    api = FakeEmbeddingsAPI()
+    monkeypatch.setattr(embeddings, "_get_cache", lambda: cache)
+    monkeypatch.setattr(embeddings, "get_openai_client", lambda: SimpleNamespace(embeddings=api))
+    yield api
+    cache.close()
+
+
+def test_embed_texts_skips_blank(api):
+    """Test that blank texts get no embedding and do not fail the others."""
+    vectors = embeddings.embed_texts(["", "The assistant reply", "   "])
+
+    assert vectors == [None, pytest.approx([0.6, 0.8]), None]
+    assert api.inputs == [["The assistant reply"]]
+
+
+def test_embed_texts_only_blank(api):
+    """Test that no request is made when every text is blank."""
+    assert embeddings.embed_texts(["", "\n"]) == [None, None]
+    assert embeddings.embed_text("") is None
+    assert api.inputs == []
+
+
+def test_embed_texts_truncates_long_texts(api):
+    """Test that texts over the input limit are sent cut to the limit."""
+    vectors = embeddings.embed_texts(["x" * (embeddings._MAX_INPUT_CHARS + 10)])
+
+    assert vectors == [pytest.approx([0.6, 0.8])]
+    assert [len(text) for text in api.inputs[0]] == [embeddings._MAX_INPUT_CHARS]
+
+
+def test_embed_texts_keeps_others_when_one_is_rejected(api):
+    """Test that a text the API rejects gets no embedding and the rest of its request still do."""
+    api.max_chars = 10
+    vectors = embeddings.embed_texts(["short", "far too long to embed", "tiny", "also short"])
+
+    assert vectors == [pytest.approx([0.6, 0.8]), None, pytest.approx([0.6, 0.8]), pytest.approx([0.6, 0.8])]
+    assert ["far too long to embed"] in api.inputs
+
+
+def test_embed_texts_splits_requests_by_size(api, monkeypatch):
+    """Test that texts are spread over requests that stay under the per-request size limit."""
+    monkeypatch.setattr(embeddings, "_MAX_REQUEST_CHARS", 10)
+    embeddings.embed_texts(["aaaa", "bbbb", "cccc"])
+
+    assert api.inputs == [["aaaa", "bbbb"], ["cccc"]]
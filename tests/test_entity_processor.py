@@ -0,0 +1,174 @@
+"""
+Tests for the entity processor.
+"""
+
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from mindgarden.memory.entity import entity_processor
+from mindgarden.memory.entity.entity_processor import (
+    EntityProcessor,
+    is_trivial_text,
+    split_content_defined,
+    write_extracted,
+)
+from mindgarden.memory.models.entity import Entity, ExtractedEntities, Relationship
+
+
+@pytest.fixture
+def processor():
+    """Fixture for an EntityProcessor with a mocked OpenAI client."""
+    with patch.object(entity_processor, "get_openai_client", MagicMock()):
+        yield EntityProcessor()
+
+
+def _document(count):
+    """Build a document with distinct lines."""
+    return "".join(f"Line {i} of the document.\n" for i in range(count))
+
+
+def test_split_content_defined_round_trip():
+    """Test that the blocks concatenate back to the original text."""
+    text = _document(500)
+
+    blocks = split_content_defined(text, mask=7)
+
+    assert len(blocks) > 1
+    assert "".join(blocks) == text
+
+
+def test_split_content_defined_local_edit():
+    """Test that editing one line leaves blocks away from the edit unchanged."""
+    text = _document(500)
+    edited = text.replace("Line 250 of the document.", "Line 250 was edited.")
+
+    blocks = split_content_defined(text, mask=7)
+    edited_blocks = split_content_defined(edited, mask=7)
+
+    assert len(set(blocks) - set(edited_blocks)) == 1
+
+
+def test_split_content_defined_paragraphs():
+    """Test that blank lines between paragraphs do not end blocks, and block sizes stay bounded."""
+    text = "".join(f"Paragraph {i} opens here.\nParagraph {i} closes here.\n\n" for i in range(300))
+
+    blocks = split_content_defined(text, min_lines=16, max_lines=64)
+
+    assert "".join(blocks) == text
+    assert len(blocks) < 300 // 5
+    line_counts = [len(block.splitlines()) for block in blocks]
+    assert all(16 <= count <= 64 for count in line_counts[:-1])
+    assert line_counts[-1] <= 64
+
+
+def test_extract_entities_from_document_merges_blocks(processor):
+    """Test that block extractions are merged without duplicates."""
+    quinn = Entity(name="Quinn", entity_type="person")
+    garden = Entity(name="Garden", entity_type="place")
+    tends = Relationship(source="Quinn", target="Garden", relationship_type="TENDS")
+    extractions = [
+        ExtractedEntities(entities=[quinn], relationships=[tends], topics=["gardening"]),
+        ExtractedEntities(entities=[quinn, garden], relationships=[tends], topics=["gardening", "plants"]),
+    ]
+
+    with patch.object(entity_processor, "split_content_defined", return_value=["block 1", "block 2"]), \
+         patch.object(processor, "extract_entities_from_text", side_effect=extractions) as extract:
+        merged = processor.extract_entities_from_document("document")
+
+    assert extract.call_count == 2
+    assert [entity.name for entity in merged.entities] == ["Quinn", "Garden"]
+    assert merged.relationships == [tends]
+    assert merged.topics == ["gardening", "plants"]
+
+
+def test_extract_entities_from_document_with_executor(processor):
+    """Test that blocks extracted on an executor are merged in document order."""
+    extractions = {
+        "block 1": ExtractedEntities(topics=["first"]),
+        "block 2": ExtractedEntities(topics=["second"]),
+    }
+
+    with patch.object(entity_processor, "split_content_defined", return_value=["block 1", "block 2"]), \
+         patch.object(processor, "extract_entities_from_text", side_effect=lambda block, _: extractions[block]), \
+         ThreadPoolExecutor(max_workers=2) as executor:
+        merged = processor.extract_entities_from_document("document", executor=executor)
+
+    assert merged.topics == ["first", "second"]
+
+
+def test_extract_entities_from_text(processor):
+    """Test converting the structured extraction response, and reusing it for the same text."""
+    completion = MagicMock()
+    completion.choices[0].message.parsed = entity_processor._ExtractionResponse.model_validate({
+        "entities": [{"name": "Quinn", "entity_type": "person", "aliases": ["Q"], "description": None}],
+        "relationships": [
+            {"source": "Quinn", "target": "Garden", "relationship_type": "TENDS", "description": None, "confidence": 1.0}
+        ],
+        "topics": ["gardening"],
+    })
+    parse = processor.client.beta.chat.completions.parse
+    parse.return_value = completion
+
+    extracted = processor.extract_entities_from_text("Quinn tends the garden.")
+    again = processor.extract_entities_from_text("Quinn tends the garden.")
+
+    assert extracted.entities == [Entity(name="Quinn", entity_type="person", aliases=["Q"])]
+    assert extracted.relationships == [Relationship(source="Quinn", target="Garden", relationship_type="TENDS")]
+    assert extracted.topics == ["gardening"]
+    assert again is extracted
+    parse.assert_called_once()
+    assert parse.call_args.kwargs["response_format"] is entity_processor._ExtractionResponse
+
+
+def test_trivial_text_skips_extraction(processor):
+    """Test that empty text and bare acknowledgements are not sent for extraction."""
+    for text in ["", "   ", "?!", "12:30", "ok", "Thanks!", "  got it. "]:
+        assert is_trivial_text(text)
+        assert processor.extract_entities_from_text(text) == ExtractedEntities()
+
+    assert not is_trivial_text("Paris")
+    processor.client.beta.chat.completions.parse.assert_not_called()
+
+
+def test_write_extracted_batches_and_drops_bad_relationships():
+    """Test that each kind of item is written with one query, without relationships lacking a type."""
+    tx = MagicMock()
+    extracted = ExtractedEntities(
+        entities=[Entity(name="Quinn", entity_type="person", aliases=["Q"]), Entity(name="Garden", entity_type="place")],
+        relationships=[
+            Relationship(source="Quinn", target="Garden", relationship_type="TENDS", confidence=0.5),
+            Relationship(source="Quinn", target="Garden", relationship_type=" "),
+            Relationship(source="Quinn", target="Mars", relationship_type="VISITS"),
+        ],
+        topics=["gardening"],
+    )
+
+    write_extracted(tx, extracted)
+
+    queries = [call.args[0] for call in tx.run.call_args_list]
+    assert queries == [
+        entity_processor._STORE_ENTITIES_QUERY,
+        entity_processor._STORE_RELATIONSHIPS_QUERY,
+        entity_processor._STORE_TOPICS_QUERY,
+    ]
+    entities, relationships, topics = (call.kwargs for call in tx.run.call_args_list)
+    assert entities["rows"] == [
+        {"name": "Quinn", "entity_type": "person", "aliases": ["Q"], "description": ""},
+        {"name": "Garden", "entity_type": "place", "aliases": [], "description": ""},
+    ]
+    # The relationship to an entity from an earlier extraction is kept for the query to match
+    assert relationships["rows"] == [
+        {"source": "Quinn", "target": "Garden", "relationship_type": "TENDS", "description": "", "confidence": 0.5},
+        {"source": "Quinn", "target": "Mars", "relationship_type": "VISITS", "description": "", "confidence": 1.0},
+    ]
+    assert topics == {"names": ["gardening"]}
+
+
+def test_write_extracted_skips_empty_kinds():
+    """Test that nothing is written for an empty extraction."""
+    tx = MagicMock()
+
+    write_extracted(tx, ExtractedEntities())
+
+    tx.run.assert_not_called()
@@ -3,12 +3,44 @@ Tests for the memory manager.
 """
 
 import pytest
-from unittest.mock import patch, MagicMock
-import time
-from datetime import datetime
+from unittest.mock import ANY
+from itertools import count
+from types import SimpleNamespace
 
+from mindgarden.memory import memory_manager as memory_manager_module
 from mindgarden.memory.memory_manager import MemoryManager
 
+# Keep this module on one worker when run in parallel with pytest-xdist
+pytestmark = pytest.mark.xdist_group(name="memory")
+
+
+class UnreachableNeo4jManager:
+    """Stand-in for Neo4jManager that never connects, keeping the manager in memory."""
+
+    def connect(self):
+        raise ConnectionError("Neo4j is disabled in unit tests")
+
+    def close(self):
+        pass
+
+
+class RecordingDbManager:
+    """Stand-in for Neo4jManager that records how often it was closed."""
+
+    def __init__(self):
+        self.close_calls = 0
+
+    def close(self):
+        self.close_calls += 1
+
+
+@pytest.fixture(scope="module", autouse=True)
+def in_memory_only():
+    """Keep every MemoryManager in this module off any live Neo4j database."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(memory_manager_module, "Neo4jManager", UnreachableNeo4jManager)
+        yield
+
 
 @pytest.fixture
 def memory_manager():
@@ -16,11 +48,27 @@ def memory_manager():
     return MemoryManager()
 
 
+@pytest.fixture(scope="module")
+def populated_manager(in_memory_only):
+    """Fixture for a MemoryManager holding two documents and a conversation, shared by read-only tests."""
+    manager = MemoryManager()
+    
+    # Hand out increasing timestamps instead of sleeping between stores
+    clock = count(1_000_000_000)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(memory_manager_module, "time", SimpleNamespace(time=lambda: next(clock)))
+        manager.store_document("Document 1 content", "doc1", {"type": "text"})
+        manager.store_document("Document 2 content", "doc2", {"type": "text"})
+        manager.store_conversation("User question", "Assistant answer")
+        
+    return manager
+
+
 def test_memory_manager_initialization():
     """Test memory manager initialization."""
     manager = MemoryManager()
     assert manager is not None
-    assert manager.memories == []
+    assert list(manager.memories) == []
 
 
 def test_store_conversation(memory_manager):
@@ -31,35 +79,24 @@ def test_store_conversation(memory_manager):
     # Verify memories were stored
     assert len(memory_manager.memories) == 2
     
-    # Check user message
-    user_memory = memory_manager.memories[0]
-    assert user_memory['text'] == "Hello, Quinn!"
-    assert user_memory['source'] == "user"
-    assert 'timestamp' in user_memory
-    assert 'date' in user_memory
-    
-    # Check assistant message
-    assistant_memory = memory_manager.memories[1]
-    assert assistant_memory['text'] == "Hi there! How can I help you?"
-    assert assistant_memory['source'] == "assistant"
-    assert 'timestamp' in assistant_memory
-    assert 'date' in assistant_memory
+    # Check both messages, including that no unexpected keys were stored
+    user_memory, assistant_memory = memory_manager.memories
+    assert user_memory == {"text": "Hello, Quinn!", "source": "user", "timestamp": ANY, "date": ANY}
+    assert assistant_memory == {
+        "text": "Hi there! How can I help you?",
+        "source": "assistant",
+        "timestamp": ANY,
+        "date": ANY,
+    }
     
     # Assistant timestamp should be slightly later
     assert assistant_memory['timestamp'] > user_memory['timestamp']
 
 
-def test_retrieve_relevant(memory_manager):
+def test_retrieve_relevant(populated_manager):
     """Test retrieving relevant memories."""
-    # Add some test memories
-    memory_manager.store_document("Document 1 content", "doc1", {"type": "text"})
-    time.sleep(0.1)  # Ensure different timestamps
-    memory_manager.store_document("Document 2 content", "doc2", {"type": "text"})
-    time.sleep(0.1)  # Ensure different timestamps
-    memory_manager.store_conversation("User question", "Assistant answer")
-    
     # Retrieve memories
-    relevant = memory_manager.retrieve_relevant("test query", limit=2)
+    relevant = populated_manager.retrieve_relevant("test query", limit=2)
     
     # Should return the 2 most recent memories
     assert len(relevant) == 2
@@ -70,26 +107,72 @@ def test_retrieve_relevant(memory_manager):
     assert "User question" in relevant[1]
 
 
-def test_store_document(memory_manager):
+def test_retrieve_cache_hit(memory_manager):
+    """Test that repeated retrievals reuse the cached result until memory changes."""
+    memory_manager.store_document("First document", "doc1")
+    
+    first = memory_manager.retrieve_relevant("test query", limit=2)
+    again = memory_manager.retrieve_relevant("test query", limit=2)
+    
+    # The second call is served from the cache without scanning memories
+    assert again == first
+    assert memory_manager._retrieve_cached.cache_info().hits == 1
+    
+    # Storing a memory invalidates the cached result
+    memory_manager.store_document("Second document", "doc2")
+    relevant = memory_manager.retrieve_relevant("test query", limit=2)
+    assert relevant[0].startswith("Second document")
+    assert memory_manager._retrieve_cached.cache_info().misses == 2
+
+
+def test_memory_cache_evicts_oldest(monkeypatch):
+    """Test that a full in-memory store drops its oldest memories and keeps recency order."""
+    config = memory_manager_module.get_config().model_copy(update={"memory_cache_size": 2})
+    monkeypatch.setattr(memory_manager_module, "get_config", lambda: config)
+    manager = MemoryManager()
+    
+    for index in range(3):
+        manager.store_document(f"Document {index}", f"doc{index}")
+        
+    # Only the two newest documents remain, newest first
+    relevant = manager.retrieve_relevant("test query", limit=5)
+    assert len(relevant) == 2
+    assert relevant[0].startswith("Document 2")
+    assert relevant[1].startswith("Document 1")
+
+
+@pytest.mark.parametrize("metadata", [{"type": "text", "author": "Test User"}, None])
+def test_store_document(memory_manager, metadata):
     """Test storing a document in memory."""
     # Store a document
     memory_manager.store_document(
         content="This is a test document.",
         source="test.txt",
-        metadata={"type": "text", "author": "Test User"}
+        metadata=metadata
     )
     
-    # Verify document was stored
-    assert len(memory_manager.memories) == 1
-    
-    # Check document properties
-    doc = memory_manager.memories[0]
-    assert doc['text'] == "This is a test document."
-    assert doc['source'] == "test.txt"
-    assert doc['type'] == "text"
-    assert doc['author'] == "Test User"
-    assert 'timestamp' in doc
-    assert 'date' in doc
+    # Check the stored document, including that no unexpected keys were stored
+    expected = {
+        "text": "This is a test document.",
+        "source": "test.txt",
+        "timestamp": ANY,
+        "date": ANY,
+        **(metadata or {}),
+    }
+    assert list(memory_manager.memories) == [expected]
+
+
+def test_close_flushes_database(memory_manager):
+    """Test that closing the manager closes its database manager, which flushes the similarity index."""
+    db_manager = RecordingDbManager()
+    memory_manager.db_manager = db_manager
+    
+    memory_manager.close()
+    
+    assert db_manager.close_calls == 1
+    # The extraction executor no longer accepts work
+    with pytest.raises(RuntimeError):
+        memory_manager.executor.submit(print)
 
 
 def test_clear_memory(memory_manager):
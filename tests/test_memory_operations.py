@@ -0,0 +1,210 @@
+"""
+Tests for the memory database operations.
+"""
+
+import pytest
+
+from mindgarden.memory.db import memory_operations
+from mindgarden.memory.entity import entity_processor
+from mindgarden.memory.models.entity import Entity, ExtractedEntities, Relationship
+
+
+def _record(memory_id):
+    """Build a projected memory record."""
+    return {
+        "id": memory_id,
+        "content": f"Memory {memory_id}",
+        "source": "user",
+        "timestamp": 1.0,
+        "date_str": "2024-01-01 00:00:00",
+        "metadata": "{}",
+    }
+
+
+class FakeDbManager:
+    """Stand-in for Neo4jManager that answers searches from canned results."""
+
+    def __init__(self, index_matches, text_matches):
+        self.index_matches = index_matches
+        self.text_matches = text_matches
+        self.queries = []
+
+    def search_memory_index(self, embedding, limit):
+        return self.index_matches[:limit]
+
+    def run_query(self, query, parameters=None):
+        self.queries.append((query, parameters))
+        if "queryNodes" in query:
+            return [_record(memory_id) for memory_id in self.text_matches[:parameters["limit"]]]
+        return [_record(memory_id) for memory_id in parameters["ids"]]
+
+
+@pytest.fixture(autouse=True)
+def fake_embedding(monkeypatch):
+    """Embed every query to the same vector without calling the API."""
+    monkeypatch.setattr(memory_operations.embeddings, "embed_text", lambda text: [1.0, 0.0])
+
+
+def test_search_memories_fills_from_unembedded():
+    """Test that memories without an embedding are found by text when similarity finds too few."""
+    db_manager = FakeDbManager(index_matches=[("a", 0.9), ("b", 0.1)], text_matches=["c"])
+
+    results = memory_operations.search_memories(db_manager, "garden", limit=3)
+
+    # The similar memory comes first, then the text match; "b" is below the threshold
+    assert [memory.id for memory in results] == ["a", "c"]
+    _, parameters = db_manager.queries[-1]
+    assert parameters["unembedded_only"] is True
+    assert parameters["limit"] == 2
+
+
+def test_search_memories_full_from_index():
+    """Test that no text search runs when similarity finds enough memories."""
+    db_manager = FakeDbManager(index_matches=[("a", 0.9), ("b", 0.8)], text_matches=["c"])
+
+    results = memory_operations.search_memories(db_manager, "garden", limit=2)
+
+    assert [memory.id for memory in results] == ["a", "b"]
+    assert len(db_manager.queries) == 1
+
+
+def test_search_memories_rejected_query_falls_back_to_text(monkeypatch):
+    """Test that a query the embeddings API rejects is still matched by text."""
+    monkeypatch.setattr(memory_operations.embeddings, "embed_text", lambda text: None)
+    db_manager = FakeDbManager(index_matches=[("a", 0.9)], text_matches=["c"])
+
+    results = memory_operations.search_memories(db_manager, "garden " * 10_000, limit=2)
+
+    assert [memory.id for memory in results] == ["c"]
+
+
+def test_text_search_matches_operators_literally():
+    """Test that Lucene syntax and uppercase operators in a query are matched as plain words."""
+    db_manager = FakeDbManager(index_matches=[], text_matches=["c"])
+
+    memory_operations._text_search_memories(db_manager, "plants NOT (cacti) AND ferns OR", limit=2)
+
+    _, parameters = db_manager.queries[-1]
+    assert parameters["query_text"] == "plants not \\(cacti\\) and ferns or"
+
+
+class FakeTx:
+    """Stand-in for a managed transaction that records the queries run on it."""
+
+    def __init__(self):
+        self.queries = []
+
+    def run(self, query, **parameters):
+        self.queries.append((query, parameters))
+
+
+class FakeWriteDbManager:
+    """Stand-in for Neo4jManager that runs write transactions on a FakeTx and logs commits and indexing."""
+
+    def __init__(self, failing_query=None):
+        self.failing_query = failing_query
+        self.events = []
+
+    def write_tx(self, fn, *args, **kwargs):
+        tx = FakeTx()
+        result = fn(tx, *args, **kwargs)
+        # A failing query rolls back everything the transaction ran
+        if any(query == self.failing_query for query, _ in tx.queries):
+            raise RuntimeError("Transaction rolled back")
+        self.events.append(("commit", [query for query, _ in tx.queries], tx.queries))
+        return result
+
+    def run_query(self, query, parameters=None):
+        self.events.append(("query", query, parameters))
+        return []
+
+    def add_to_memory_index(self, memory_id, embedding):
+        self.events.append(("index", memory_id, embedding))
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """Embed texts to fixed vectors without calling the API."""
+    monkeypatch.setattr(
+        memory_operations.embeddings, "embed_texts",
+        lambda texts: [[float(index), 1.0] for index in range(len(texts))],
+    )
+
+
+def _extracted():
+    """Build an extraction with two entities, a relationship and a topic."""
+    return ExtractedEntities(
+        entities=[Entity(name="Quinn", entity_type="person"), Entity(name="Garden", entity_type="place")],
+        relationships=[Relationship(source="Quinn", target="Garden", relationship_type="TENDS")],
+        topics=["gardening"],
+    )
+
+
+def test_store_memories_with_graph_one_transaction(fake_embeddings):
+    """Test that memories and their graph are written in order in one transaction, then indexed."""
+    db_manager = FakeWriteDbManager()
+
+    ids = memory_operations.store_memories_with_graph(db_manager, [
+        ("Quinn tends the garden.", "user", {"date": "today"}, _extracted()),
+        ("Nice.", "assistant", None, ExtractedEntities()),
+    ])
+
+    (commit, queries, runs), *indexed = db_manager.events
+    assert commit == "commit"
+    assert queries == [
+        memory_operations._CREATE_MEMORIES_QUERY,
+        entity_processor._STORE_ENTITIES_QUERY,
+        entity_processor._STORE_RELATIONSHIPS_QUERY,
+        entity_processor._STORE_TOPICS_QUERY,
+        memory_operations._CONNECT_QUERY,
+    ]
+
+    # The memory rows carry their content, JSON metadata and embedding
+    rows = runs[0][1]["rows"]
+    assert [row["id"] for row in rows] == ids
+    assert [(row["content"], row["source"], row["metadata"]) for row in rows] == [
+        ("Quinn tends the garden.", "user", '{"date":"today"}'),
+        ("Nice.", "assistant", "{}"),
+    ]
+    assert runs[4][1] == {"memory_id": ids[0], "entity_names": ["Quinn", "Garden"], "topics": ["gardening"]}
+
+    # Embeddings are indexed only after the commit
+    assert indexed == [("index", ids[0], [0.0, 1.0]), ("index", ids[1], [1.0, 1.0])]
+
+
+def test_store_memories_with_graph_keeps_memories_on_graph_failure(fake_embeddings):
+    """Test that memories are still stored when writing their entity graph fails."""
+    db_manager = FakeWriteDbManager(failing_query=entity_processor._STORE_RELATIONSHIPS_QUERY)
+
+    ids = memory_operations.store_memories_with_graph(db_manager, [
+        ("Quinn tends the garden.", "user", None, _extracted()),
+    ])
+
+    (commit, queries, _), indexed = db_manager.events
+    assert commit == "commit"
+    assert queries == [memory_operations._CREATE_MEMORIES_QUERY]
+    assert indexed == ("index", ids[0], [0.0, 1.0])
+
+
+def test_store_memories_with_graph_failure_skips_index(fake_embeddings):
+    """Test that nothing is indexed when the memories cannot be stored at all."""
+    db_manager = FakeWriteDbManager(failing_query=memory_operations._CREATE_MEMORIES_QUERY)
+
+    with pytest.raises(RuntimeError):
+        memory_operations.store_memories_with_graph(db_manager, [
+            ("Quinn tends the garden.", "user", None, _extracted()),
+        ])
+
+    assert db_manager.events == []
+
+
+def test_connect_memory_to_entities_and_topics():
+    """Test that a memory is connected to its entities and topics with one query, and skipped when there are none."""
+    db_manager = FakeWriteDbManager()
+
+    memory_operations.connect_memory_to_entities_and_topics(db_manager, "m1", [], [])
+    memory_operations.connect_memory_to_entities_and_topics(db_manager, "m1", ["Quinn"], ["gardening"])
+
+    assert db_manager.events == [
+        ("query", memory_operations._CONNECT_QUERY, {"memory_id": "m1", "entity_names": ["Quinn"], "topics": ["gardening"]})
+    ]